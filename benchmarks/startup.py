@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+PACKAGE_FOLDER = Path(__file__).parent.parent.joinpath('keysec').resolve()
+
+
+def portable_layout(folder: Path) -> Path:
+    # Same layout as the autopackage portable build: __main__.py at the root, next to the keysec package
+    shutil.copy(PACKAGE_FOLDER.joinpath('__main__.py'), folder.joinpath('__main__.py'))
+    folder.joinpath('keysec').symlink_to(PACKAGE_FOLDER)
+    return folder
+
+
+def time_runs(app: Path, runs: int, env: dict) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(app), '--version'], env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the portable build startup time with and without the library cache')
+    parser.add_argument('--runs', '-n', type=int, default=20, help='number of launches measured for each mode')
+    args = parser.parse_args()
+    with TemporaryDirectory() as app, TemporaryDirectory() as cache:
+        app = portable_layout(Path(app))
+        base_env = dict(os.environ, XDG_CACHE_HOME=cache)
+        modes = {
+            'extract every run': dict(base_env, KEYSEC_NO_LIB_CACHE='1'),
+            'cached libraries': base_env,
+        }
+        time_runs(app, 1, base_env)  # populate the cache
+        for name, env in modes.items():
+            timings = time_runs(app, args.runs, env)
+            print(f'{name:>18}: median {statistics.median(timings):7.1f} ms   min {min(timings):7.1f} ms   max {max(timings):7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
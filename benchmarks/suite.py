@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, Tuple
+
+REPO_FOLDER = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(REPO_FOLDER))
+
+PASSPHRASE = 'bench'
+ALGORITHMS = {'ed25519': ('ed25519', 256), 'ecdsa256': ('ecdsa', 256), 'rsa2048': ('rsa', 2048)}
+FORMATS = ('openssl', 'openssh')
+
+
+def make_fixtures(folder: Path) -> Dict[str, Path]:
+    # Every algorithm in both formats, as a plain private key, an encrypted one and a public one
+    from keysec import api
+    fixtures = {}
+    for name, (algorithm, bits) in ALGORITHMS.items():
+        for fmt in FORMATS:
+            private = api.gen_private(algorithm=algorithm, fmt=fmt, bits=bits)
+            if fmt == 'openssh':
+                private = api.edit(private, comment='bench@host')
+            keys = {
+                'private': private,
+                'private-enc': api.edit(private, new_passphrase=PASSPHRASE),
+                'public': api.gen_public(private),
+            }
+            for kind, data in keys.items():
+                fixtures[f'{name}-{fmt}-{kind}'] = path = folder.joinpath(f'{name}-{fmt}-{kind}')
+                path.write_bytes(data)
+    return fixtures
+
+
+def summarize(timings: List[float]) -> dict:
+    timings = sorted(timings)
+
+    def percentile(q: float) -> float:
+        return timings[min(len(timings) - 1, int(q * len(timings)))]
+
+    return {'runs': len(timings), 'ops_per_sec': round(len(timings) / sum(timings), 2), 'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+            'p50_ms': round(percentile(0.5) * 1000, 3), 'p90_ms': round(percentile(0.9) * 1000, 3), 'p99_ms': round(percentile(0.99) * 1000, 3)}
+
+
+def measure(func: Callable[[], object], min_time: float, min_runs: int) -> dict:
+    func()  # warm up caches and lazy imports
+    timings, deadline = [], time.perf_counter() + min_time
+    while len(timings) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def inprocess_cases(fixtures: Dict[str, Path]) -> List[Tuple[str, Callable[[], object]]]:
+    from keysec import api
+    from keysec.iokeys import Key
+
+    def load(key_data: bytes) -> Key:
+        key = Key(prompt=lambda _: PASSPHRASE)
+        key.load_key(key_data=key_data)
+        return key
+
+    cases = []
+    for name, path in fixtures.items():
+        data = path.read_bytes()
+        loaded = load(data)
+        cases += [
+            (f'inprocess/load/{name}', lambda data=data: load(data)),
+            (f'inprocess/to_bytes/{name}', lambda loaded=loaded: loaded.to_bytes()),
+            (f'inprocess/convert/{name}', lambda data=data: api.convert(data, passphrase=PASSPHRASE)),
+            (f'inprocess/info/{name}', lambda data=data: api.info(data, passphrase=PASSPHRASE)),
+        ]
+        if not name.endswith('-public'):
+            cases.append((f'inprocess/gen_public/{name}', lambda data=data: api.gen_public(data, passphrase=PASSPHRASE)))
+        if '-openssh-' in name:
+            cases.append((f'inprocess/edit_comment/{name}', lambda data=data: api.edit(data, passphrase=PASSPHRASE, comment='edited@host')))
+    for name, algorithm, bits in (('ed25519', 'ed25519', 256), ('ecdsa256', 'ecdsa', 256), ('rsa2048', 'rsa', 2048), ('rsa4096', 'rsa', 4096)):
+        cases.append((f'inprocess/gen_private/{name}', lambda algorithm=algorithm, bits=bits: api.gen_private(algorithm=algorithm, bits=bits)))
+    return cases
+
+
+def cli_cases(fixtures: Dict[str, Path]) -> List[Tuple[str, List[str], str]]:
+    # Full invocations, including interpreter startup and passphrase prompts answered through stdin
+    cases = []
+    for name, path in fixtures.items():
+        if not name.startswith('ed25519-') and not name.endswith('-private'):
+            continue
+        stdin = PASSPHRASE + '\n' if name.endswith('-enc') else ''
+        cases += [(f'cli/conv/{name}', ['conv', '-i', str(path)], stdin), (f'cli/info/{name}', ['info', '-i', str(path)], stdin)]
+        if not name.endswith('-public'):
+            cases.append((f'cli/gen_public/{name}', ['gen', 'pub', '-i', str(path)], stdin))
+        if '-openssh-' in name:
+            cases.append((f'cli/edit_comment/{name}', ['edit', '-c', 'edited@host', '-i', str(path)], stdin))
+    for name, args in (('ed25519', ['-a', 'ed25519']), ('rsa2048', ['-a', 'rsa', '-b', '2048']), ('rsa4096', ['-a', 'rsa', '-b', '4096'])):
+        cases.append((f'cli/gen_private/{name}', ['gen', 'priv', *args], ''))
+    return cases
+
+
+def run_cli(args: List[str], stdin: str):
+    # A new session has no controlling terminal, so getpass falls back to reading the passphrase from stdin
+    env = dict(os.environ, PYTHONPATH=str(REPO_FOLDER))
+    subprocess.run([sys.executable, '-m', 'keysec.keysec', *args], input=stdin, text=True, env=env, check=True, start_new_session=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run(args: argparse.Namespace) -> dict:
+    import cryptography
+    selected = re.compile(args.filter or '')
+    results = {}
+    with TemporaryDirectory() as folder:
+        fixtures = make_fixtures(Path(folder))
+        if args.mode in ('all', 'inprocess'):
+            for name, func in inprocess_cases(fixtures):
+                if selected.search(name):
+                    results[name] = measure(func, min_time=args.min_time, min_runs=args.min_runs)
+                    report(name, results[name])
+        if args.mode in ('all', 'cli'):
+            for name, cli_args, stdin in cli_cases(fixtures):
+                if selected.search(name):
+                    results[name] = measure(lambda: run_cli(cli_args, stdin), min_time=0, min_runs=args.cli_runs)
+                    report(name, results[name])
+    meta = {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'python': platform.python_version(), 'platform': platform.platform(),
+            'cryptography': cryptography.__version__, 'git': git_revision()}
+    return {'meta': meta, 'results': results}
+
+
+def git_revision() -> str:
+    res = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_FOLDER, capture_output=True, text=True)
+    return res.stdout.strip() if res.returncode == 0 else None
+
+
+def report(name: str, result: dict):
+    print(f'{name:<52} {result["ops_per_sec"]:>10.1f} ops/s   p50 {result["p50_ms"]:>9.3f} ms   p90 {result["p90_ms"]:>9.3f} ms   '
+          f'p99 {result["p99_ms"]:>9.3f} ms   ({result["runs"]} runs)', flush=True)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    # A benchmark regresses when its median latency grew by more than threshold percent
+    regressions = 0
+    print(f'\n{"benchmark":<52} {"baseline p50":>14} {"current p50":>14} {"change":>9}')
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name]['p50_ms'], result['p50_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        flag = '  REGRESSION' if change > threshold else ''
+        regressions += bool(flag)
+        print(f'{name:<52} {before:>11.3f} ms {after:>11.3f} ms {change:>+8.1f}%{flag}')
+    print(f'\n{regressions} regression(s) above {threshold:g}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure keysec operations in-process and as full CLI invocations')
+    parser.add_argument('--mode', choices=['all', 'inprocess', 'cli'], default='all', help='which benchmarks to run')
+    parser.add_argument('--filter', '-k', metavar='regex', default=None, help='only run the benchmarks whose name matches this regular expression')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum number of seconds spent on each in-process benchmark')
+    parser.add_argument('--min-runs', type=int, default=5, help='minimum number of runs of each in-process benchmark')
+    parser.add_argument('--cli-runs', type=int, default=5, help='number of runs of each CLI benchmark')
+    parser.add_argument('--save', metavar='file', default=None, help='write the results to this JSON file, to be used as a baseline later')
+    parser.add_argument('--compare', metavar='baseline', default=None, help='compare the results against this JSON baseline')
+    parser.add_argument('--current', metavar='file', default=None, help='with --compare, read the current results from this file instead of running')
+    parser.add_argument('--threshold', type=float, default=10.0, help='median latency increase, in percent, reported as a regression')
+    args = parser.parse_args()
+
+    if args.current:
+        current = json.loads(Path(args.current).read_text(encoding='utf-8'))
+    else:
+        current = run(args)
+    if args.save:
+        Path(args.save).write_text(json.dumps(current, indent=2) + '\n', encoding='utf-8')
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,22 +2,61 @@
 # encoding:utf-8
 
 
-import collections
+import hashlib
+import os
+import shutil
 import sys
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from tempfile import mkdtemp, TemporaryDirectory
 from zipfile import ZipFile
 
+from keysec import trace
+
 LIBS_FOLDER = Path(__file__).parent.joinpath('keysec').joinpath('libs').resolve()
+CACHE_FOLDER = Path(os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')).joinpath('keysec')
 
 tempdirs = []
 
-for lib in LIBS_FOLDER.iterdir():
+
+def extract_temporary(lib: Path) -> Path:
     tempdirs.append(temp_folder := TemporaryDirectory())
     with ZipFile(file=lib, mode='r') as library:
         library.extractall(temp_folder.name)
+    return Path(temp_folder.name)
+
+
+def extract_cached(lib: Path) -> Path:
+    # Libraries are extracted once per content hash. The extraction happens in a private temporary folder that is atomically renamed, so parallel
+    # first runs never see a half-populated folder: the loser of the race just throws its copy away.
+    with open(lib, mode='rb') as library:
+        target = CACHE_FOLDER.joinpath(hashlib.sha256(library.read()).hexdigest())
+    if not target.is_dir():
+        CACHE_FOLDER.mkdir(mode=0o700, parents=True, exist_ok=True)
+        temp_folder = mkdtemp(prefix='.tmp-', dir=CACHE_FOLDER)
+        with ZipFile(file=lib, mode='r') as library:
+            library.extractall(temp_folder)
+        try:
+            os.rename(temp_folder, target)
+        except OSError:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+    return target
+
+
+def lib_path(lib: Path) -> Path:
+    if lib.stem.endswith('-none-any'):  # pure Python wheels are imported straight from the archive by zipimport
+        return lib
+    if os.environ.get('KEYSEC_NO_LIB_CACHE'):
+        return extract_temporary(lib)
+    try:
+        return extract_cached(lib)
+    except OSError:
+        return extract_temporary(lib)
+
 
-collections.deque((sys.path.insert(0, temp_folder.name) for temp_folder in tempdirs), maxlen=0)
+trace.begin()
+with trace.span('extract_libs'):
+    for lib in sorted(LIBS_FOLDER.iterdir()):
+        sys.path.insert(0, str(lib_path(lib)))
 
 if __name__ == '__main__':
     from keysec.keysec import main
@@ -3,6 +3,6 @@
 
 
 from keysec.actions.conv import convert
-from keysec.actions.edit import edit
+from keysec.actions.edit import ask_new_password, edit
 from keysec.actions.gen import gen_private, gen_public
 from keysec.actions.info import info
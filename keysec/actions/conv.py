@@ -2,7 +2,7 @@
 # encoding:utf-8
 
 
-from cryptography.hazmat.primitives.serialization import PrivateFormat, PublicFormat
+from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat, PublicFormat
 
 from keysec.iokeys import Key
 
@@ -14,6 +14,10 @@ _transform = {
 }
 
 
-def convert(key: Key, nopass=False) -> str:
+def convert(key: Key, nopass=False, kdf: str = None, rounds: int = None, password: str = None, encoding: Encoding = None) -> bytes:
+    # password replaces the passphrase of private keys, None keeps the current one. Binary encodings only exist for the OpenSSL formats, so with
+    # one of them every key is written in its OpenSSL format, which also turns PEM keys into DER or raw ones
     dst_format = _transform[key.orig_format]
-    return key.to_str(str_format=dst_format, password='') if nopass else key.to_str(str_format=dst_format)
+    if encoding is not None and encoding is not Encoding.PEM:
+        dst_format = PrivateFormat.PKCS8 if isinstance(key.orig_format, PrivateFormat) else PublicFormat.SubjectPublicKeyInfo
+    return key.to_bytes(str_format=dst_format, password='' if nopass else password, kdf=kdf, rounds=rounds, encoding=encoding)
@@ -7,26 +7,103 @@
 
 
 from argparse import ArgumentError
-from typing import Type, Union
+from pathlib import Path
+from typing import List, Tuple, Type, Union
 
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
-from cryptography.hazmat.primitives.serialization import PrivateFormat, PublicFormat
+from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat, PublicFormat
 
-from keysec.iokeys import Key
+from keysec import openssh
+from keysec.iokeys import Key, make_private_dir, terminated
+from keysec.output import write_temp
 from keysec.parsers import in_arg
 
+Algorithm = Type[Union[Ed25519PrivateKey, EllipticCurvePrivateKey, RSAPrivateKey]]
 
-def gen_private(algorithm: Type[Union[Ed25519PrivateKey, RSAPrivateKey]], dst_format: PrivateFormat, bits: int = None) -> str:
+algorithms = {
+    'rsa': RSAPrivateKey,
+    'ecdsa': EllipticCurvePrivateKey,
+    'ed25519': Ed25519PrivateKey,
+}
+
+# Key sizes each algorithm accepts, the first one being the default
+key_sizes = {
+    RSAPrivateKey: tuple(range(2048, 8193, 1024)),
+    EllipticCurvePrivateKey: (256, 384, 521),
+    Ed25519PrivateKey: (256,),
+}
+
+curves = {
+    256: ec.SECP256R1,
+    384: ec.SECP384R1,
+    521: ec.SECP521R1,
+}
+
+formats = {
+    'openssl': PrivateFormat.PKCS8,
+    'openssh': PrivateFormat.OpenSSH,
+}
+
+_public_formats = {
+    PrivateFormat.PKCS8: PublicFormat.SubjectPublicKeyInfo,
+    PrivateFormat.OpenSSH: PublicFormat.OpenSSH,
+}
+
+
+def algorithm_name(algorithm: Algorithm) -> str:
+    return next(name for name, algo in algorithms.items() if algo is algorithm)
+
+
+def key_bits(algorithm: Algorithm, bits: int = None) -> int:
+    # Ed25519 keys ignore the requested size, as ssh-keygen does
+    if algorithm is Ed25519PrivateKey or bits is None:
+        return key_sizes[algorithm][0]
+    if bits not in key_sizes[algorithm]:
+        raise ValueError(f'{algorithm_name(algorithm).upper()} keys can only be {", ".join(map(str, key_sizes[algorithm]))} bits long')
+    return bits
+
+
+def new_private_key(algorithm: Algorithm, bits: int = None) -> Key:
+    bits = key_bits(algorithm, bits)
     key = Key()
-    key.key = rsa.generate_private_key(public_exponent=65537, key_size=bits) if algorithm is RSAPrivateKey else Ed25519PrivateKey.generate()
+    if algorithm is RSAPrivateKey:
+        key.key = rsa.generate_private_key(public_exponent=65537, key_size=bits)
+    elif algorithm is EllipticCurvePrivateKey:
+        key.key = ec.generate_private_key(curves[bits]())
+    else:
+        key.key = Ed25519PrivateKey.generate()
     key.orig_format = PrivateFormat.PKCS8
-    return key.to_str(str_format=dst_format)
+    return key
+
+
+def gen_private(algorithm: Algorithm, dst_format: PrivateFormat, bits: int = None, password: str = '', kdf: str = None,
+                rounds: int = None, encoding: Encoding = None) -> bytes:
+    return new_private_key(algorithm=algorithm, bits=bits).to_bytes(str_format=dst_format, password=password, kdf=kdf, rounds=rounds, encoding=encoding)
+
+
+def gen_files(index: int, outdir: Path, name: str, public: bool, algorithm: Algorithm, dst_format: PrivateFormat, bits: int = None,
+              password: str = '', kdf: str = None, rounds: int = None, encoding: Encoding = None) -> Tuple[dict, List[Tuple[Path, Path]]]:
+    # Returns the manifest record of the key, and its files staged next to their final paths, to be renamed into place by the caller
+    key = new_private_key(algorithm=algorithm, bits=bits)
+    path = outdir.joinpath(name.format(n=index, algo=algorithm_name(algorithm)))
+    make_private_dir(path.parent)
+    staged = [(write_temp(path, terminated(key.to_bytes(str_format=dst_format, password=password, kdf=kdf, rounds=rounds, encoding=encoding))), path)]
+    record = {'path': str(path), 'public_path': None, 'algorithm': algorithm_name(algorithm), 'bits': getattr(key.key, 'key_size', 256),
+              'fingerprint': openssh.fingerprint(openssh.public_blob(key.key.public_key()))}
+    if public:
+        record['public_path'] = f'{path}.pub'
+        public_key = terminated(key.to_bytes(str_format=_public_formats[dst_format], encoding=encoding))
+        staged.append((write_temp(record['public_path'], public_key), Path(record['public_path'])))
+    return record, staged
 
 
-def gen_public(priv_key: Key) -> str:
+def gen_public(priv_key: Key, encoding: Encoding = None, comment: bool = True) -> bytes:
     if not isinstance(priv_key.orig_format, PrivateFormat):
         raise ArgumentError(argument=in_arg, message='specified key is not private')
-    dst_format = PublicFormat.OpenSSH if priv_key.orig_format is PrivateFormat.OpenSSH else PublicFormat.SubjectPublicKeyInfo
-    return priv_key.to_str(str_format=dst_format)
+    # Binary encodings only exist for the OpenSSL format, which public keys of OpenSSH keys are then written in
+    binary = encoding is not None and encoding is not Encoding.PEM
+    return priv_key.to_bytes(str_format=PublicFormat.SubjectPublicKeyInfo if binary else _public_formats[priv_key.orig_format], comment=None if comment else '',
+                             encoding=encoding)
@@ -2,21 +2,112 @@
 # encoding:utf-8
 
 
-import subprocess
-from tempfile import TemporaryFile
-
-from keysec.actions.conv import convert
-from keysec.iokeys import Key, write_output
-
-
-def info(key: Key) -> str:
-    command = ['openssl', 'pkey', '-text', '--noout']
-    command.append('-pubin') if key.is_public() else None
-    key_str = convert(key, nopass=True) if key.is_ssh() else key.to_str(password='')
-    with TemporaryFile(mode='w+', encoding='utf-8') as tmp:
-        write_output(text=key_str, file=tmp, close=False)
-        tmp.seek(0)
-        res = subprocess.run(command, capture_output=True, text=True, check=True, stdin=tmp).stdout.strip()
-    res += f'\nFingerprint: {key.fingerprint}' if key.get_ssh_fingerprint() else ''
-    res += f'\nOpenSSH comment: {key.comment}' if key.get_ssh_comment() else ''
+import json
+
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey, EllipticCurvePublicKey
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat, PublicFormat
+
+from keysec.iokeys import Key
+
+
+_json_names = {
+    'Modulus': 'modulus',
+    'Exponent': 'public_exponent',
+    'publicExponent': 'public_exponent',
+    'privateExponent': 'private_exponent',
+    'prime1': 'prime1',
+    'prime2': 'prime2',
+    'exponent1': 'exponent1',
+    'exponent2': 'exponent2',
+    'coefficient': 'coefficient',
+    'ASN1 OID': 'asn1_oid',
+    'NIST CURVE': 'nist_curve',
+}
+
+# Curve names as printed by openssl ec -text
+_curve_names = {
+    'secp256r1': ('prime256v1', 'P-256'),
+    'secp384r1': ('secp384r1', 'P-384'),
+    'secp521r1': ('secp521r1', 'P-521'),
+}
+
+
+def _bn_bytes(value: int) -> bytes:
+    # RSA integers, same as OpenSSL: big-endian magnitude with a leading zero byte when the high bit is set
+    return value.to_bytes(value.bit_length() // 8 + 1, 'big') if value else b'\x00'
+
+
+def _hexdump(data: bytes) -> str:
+    lines = (':'.join(f'{b:02x}' for b in data[i:i + 15]) for i in range(0, len(data), 15))
+    return ':\n'.join(f'    {line}' for line in lines)
+
+
+def _text_field(name: str, value) -> str:
+    if isinstance(value, str):
+        return f'{name}: {value}'
+    if isinstance(value, int) and value.bit_length() <= 64:
+        return f'{name}: {value} ({value:#x})'
+    return f'{name}:\n{_hexdump(_bn_bytes(value) if isinstance(value, int) else value)}'
+
+
+def key_fields(key: Key) -> tuple:
+    """Returns the report header and the (label, value) pairs describing the key material."""
+    if isinstance(key.key, (Ed25519PrivateKey, Ed25519PublicKey)):
+        pub = key.key.public_key() if key.is_private() else key.key
+        fields = [('pub', pub.public_bytes(encoding=Encoding.Raw, format=PublicFormat.Raw))]
+        if key.is_private():
+            fields.insert(0, ('priv', key.key.private_bytes(encoding=Encoding.Raw, format=PrivateFormat.Raw, encryption_algorithm=NoEncryption())))
+            return 'ED25519 Private-Key:', fields
+        return 'ED25519 Public-Key:', fields
+    if isinstance(key.key, (EllipticCurvePrivateKey, EllipticCurvePublicKey)):
+        pub = key.key.public_key() if key.is_private() else key.key
+        oid, nist = _curve_names.get(pub.curve.name, (pub.curve.name, None))
+        fields = [('pub', pub.public_bytes(encoding=Encoding.X962, format=PublicFormat.UncompressedPoint)), ('ASN1 OID', oid)]
+        fields += [('NIST CURVE', nist)] if nist else []
+        if key.is_private():
+            # A fixed-length octet string, unlike the RSA integers
+            fields.insert(0, ('priv', key.key.private_numbers().private_value.to_bytes((pub.curve.key_size + 7) // 8, 'big')))
+            return f'Private-Key: ({pub.curve.key_size} bit)', fields
+        return f'Public-Key: ({pub.curve.key_size} bit)', fields
+    if isinstance(key.key, RSAPrivateKey):
+        priv = key.key.private_numbers()
+        fields = [('modulus', priv.public_numbers.n), ('publicExponent', priv.public_numbers.e), ('privateExponent', priv.d), ('prime1', priv.p), ('prime2', priv.q),
+                  ('exponent1', priv.dmp1), ('exponent2', priv.dmq1), ('coefficient', priv.iqmp)]
+        return f'Private-Key: ({key.key.key_size} bit, 2 primes)', fields
+    pub = key.key.public_numbers()
+    return f'Public-Key: ({key.key.key_size} bit)', [('Modulus', pub.n), ('Exponent', pub.e)]
+
+
+def key_type(key: Key) -> str:
+    if isinstance(key.key, (Ed25519PrivateKey, Ed25519PublicKey)):
+        return 'ED25519'
+    return 'ECDSA' if isinstance(key.key, (EllipticCurvePrivateKey, EllipticCurvePublicKey)) else 'RSA'
+
+
+def report(key: Key) -> dict:
+    _, fields = key_fields(key)
+    res = {'type': key_type(key), 'private': key.is_private(), 'bits': getattr(key.key, 'key_size', 256)}
+    res.update((_json_names.get(name, name), value if isinstance(value, str) or (isinstance(value, int) and value.bit_length() <= 64) else
+                (value.hex() if isinstance(value, bytes) else f'{value:x}')) for name, value in fields)
+    res.update(fingerprint=key.get_ssh_fingerprint(), comment=key.get_ssh_comment(), kdf=key.kdf, kdf_rounds=key.kdf_rounds)
     return res
+
+
+def fingerprint_line(key: Key) -> str:
+    # Same layout as ssh-keygen -l
+    return f'{getattr(key.key, "key_size", 256)} {key.get_fingerprint()} {key.get_ssh_comment() or "no comment"} ({key_type(key)})'
+
+
+def info(key: Key, as_json: bool = False) -> bytes:
+    if as_json:
+        return json.dumps(report(key), indent=2).encode('utf-8')
+    header, fields = key_fields(key)
+    fingerprint, comment = key.get_ssh_fingerprint(), key.get_ssh_comment()
+    res = '\n'.join([header, *(_text_field(name, value) for name, value in fields)])
+    res += f'\nFingerprint: {fingerprint}' if fingerprint else ''
+    res += f'\nOpenSSH comment: {comment}' if comment else ''
+    if key.kdf:
+        res += f'\nKDF: {key.kdf} (N={key.kdf_rounds})' if key.kdf == 'scrypt' else f'\nKDF: {key.kdf} ({key.kdf_rounds} rounds)'
+    return res.encode('utf-8')
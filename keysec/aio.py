@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+"""
+asyncio interface of keysec.
+
+The coroutines here take and return the same values as the ones of keysec.api, but the work itself (key generation, KDFs, parsing) runs in a
+bounded pool of worker processes, so the event loop is never blocked and many requests can be awaited at once. Requests beyond the size of the
+queue wait in the event loop without holding a worker, and cancelling one that has not started yet frees its place right away; one that is
+already running finishes in its worker and its result is dropped.
+
+Passphrases may also be coroutine functions. They are awaited in the event loop, and only when the key turns out to be encrypted, before the key
+is handed to a worker.
+"""
+
+import asyncio
+import inspect
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Optional, Union
+
+from cryptography.hazmat.primitives.serialization import PrivateFormat
+
+from keysec import api
+from keysec.iokeys import key_bytes_of, KeyKind, sniff_key
+
+Data = api.Data
+Secret = api.Secret
+Passphrase = Optional[Union[Secret, Callable[[], Union[Secret, Awaitable[Secret]]]]]
+
+__all__ = ['KeyPool', 'default_pool', 'convert', 'gen_private', 'gen_public', 'edit', 'info']
+
+
+async def _resolve(passphrase: Passphrase) -> Optional[Secret]:
+    value = passphrase() if callable(passphrase) else passphrase
+    return await value if inspect.isawaitable(value) else value
+
+
+def _kind(data: Data) -> Optional[KeyKind]:
+    # None when the input is not a key, which the worker then reports
+    try:
+        return sniff_key(key_bytes_of(data))
+    except ValueError:
+        return None
+
+
+class KeyPool:
+    """
+    jobs is the number of workers (one per CPU by default) and queue the number of requests handed to them at once (four per worker by default).
+    threads=True runs the work in threads of this process instead, which starts faster but only scales as far as the GIL is released.
+    """
+
+    def __init__(self, jobs: int = None, queue: int = None, threads: bool = False):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.queue = queue or self.jobs * 4
+        self._executor: Executor = (ThreadPoolExecutor if threads else ProcessPoolExecutor)(max_workers=self.jobs)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    async def __aenter__(self) -> 'KeyPool':
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # semaphores belong to the loop they are first used in
+            self._slots, self._loop = asyncio.Semaphore(self.queue), loop
+        async with self._slots:
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _passphrase(self, data: Data, passphrase: Passphrase) -> Optional[Secret]:
+        kind = _kind(data)
+        return await _resolve(passphrase) if kind is not None and kind.encrypted else None
+
+    async def convert(self, data: Data, passphrase: Passphrase = None, nopass: bool = False, kdf: str = None, rounds: int = None,
+                      new_passphrase: Passphrase = None, encoding: str = None) -> bytes:
+        return await self.run(api.convert, data, passphrase=await self._passphrase(data, passphrase), nopass=nopass, kdf=kdf, rounds=rounds,
+                              new_passphrase=await _resolve(new_passphrase), encoding=encoding)
+
+    async def gen_private(self, algorithm: str = 'ed25519', fmt: str = 'openssl', bits: int = None, new_passphrase: Passphrase = '', kdf: str = None,
+                          rounds: int = None, encoding: str = None) -> bytes:
+        return await self.run(api.gen_private, algorithm=algorithm, fmt=fmt, bits=bits, new_passphrase=await _resolve(new_passphrase) or '', kdf=kdf, rounds=rounds,
+                              encoding=encoding)
+
+    async def gen_public(self, data: Data, passphrase: Passphrase = None, encoding: str = None, comment: bool = True) -> bytes:
+        kind = _kind(data)
+        if kind is not None and kind.container is not None and not comment:  # the public half of OpenSSH keys is not encrypted, unlike the comment
+            return await self.run(api.gen_public, data, encoding=encoding, comment=comment)
+        return await self.run(api.gen_public, data, passphrase=await self._passphrase(data, passphrase), encoding=encoding, comment=comment)
+
+    async def edit(self, data: Data, passphrase: Passphrase = None, comment: str = None, new_passphrase: Passphrase = None, kdf: str = None,
+                   rounds: int = None, encoding: str = None) -> bytes:
+        """Same as keysec.api.edit, except that comment must be given as a str. A callable new_passphrase is only asked for private keys."""
+        if callable(new_passphrase):
+            kind = _kind(data)
+            new_passphrase = await _resolve(new_passphrase) if kind is not None and isinstance(kind.orig_format, PrivateFormat) else None
+        return await self.run(api.edit, data, passphrase=await self._passphrase(data, passphrase), comment=comment, new_passphrase=new_passphrase, kdf=kdf,
+                              rounds=rounds, encoding=encoding)
+
+    async def info(self, data: Data, passphrase: Passphrase = None, as_json: bool = False) -> bytes:
+        return await self.run(api.info, data, passphrase=await self._passphrase(data, passphrase), as_json=as_json)
+
+
+_default: Optional[KeyPool] = None
+
+
+def default_pool() -> KeyPool:
+    """Pool shared by the module level coroutines, created on first use."""
+    global _default
+    if _default is None:
+        _default = KeyPool()
+    return _default
+
+
+async def convert(data: Data, passphrase: Passphrase = None, nopass: bool = False, kdf: str = None, rounds: int = None, new_passphrase: Passphrase = None,
+                  encoding: str = None) -> bytes:
+    return await default_pool().convert(data, passphrase=passphrase, nopass=nopass, kdf=kdf, rounds=rounds, new_passphrase=new_passphrase, encoding=encoding)
+
+
+async def gen_private(algorithm: str = 'ed25519', fmt: str = 'openssl', bits: int = None, new_passphrase: Passphrase = '', kdf: str = None, rounds: int = None,
+                      encoding: str = None) -> bytes:
+    return await default_pool().gen_private(algorithm=algorithm, fmt=fmt, bits=bits, new_passphrase=new_passphrase, kdf=kdf, rounds=rounds, encoding=encoding)
+
+
+async def gen_public(data: Data, passphrase: Passphrase = None, encoding: str = None, comment: bool = True) -> bytes:
+    return await default_pool().gen_public(data, passphrase=passphrase, encoding=encoding, comment=comment)
+
+
+async def edit(data: Data, passphrase: Passphrase = None, comment: str = None, new_passphrase: Passphrase = None, kdf: str = None, rounds: int = None,
+               encoding: str = None) -> bytes:
+    return await default_pool().edit(data, passphrase=passphrase, comment=comment, new_passphrase=new_passphrase, kdf=kdf, rounds=rounds, encoding=encoding)
+
+
+async def info(data: Data, passphrase: Passphrase = None, as_json: bool = False) -> bytes:
+    return await default_pool().info(data, passphrase=passphrase, as_json=as_json)
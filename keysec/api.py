@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+"""
+Library interface of keysec.
+
+Every function takes the key as bytes (or str) and returns bytes, exactly as they would be written to a file. Keys may be PEM, OpenSSH, DER or raw
+Ed25519 keys, and encoding ('pem', 'der' or 'raw') picks the encoding of the keys returned. Nothing here prompts, touches the
+process umask or reads global state, so these functions can be called from many threads at once.
+
+Passphrases are given either as a str/bytes value or as a callable returning one. Callables are only invoked when the key turns out to be
+encrypted, so they can be used to fetch a secret lazily.
+"""
+
+from argparse import ArgumentError
+from typing import Callable, Optional, Union
+
+from keysec.actions.conv import convert as _convert
+from keysec.actions.edit import edit as _edit
+from keysec.actions.gen import algorithms, formats, gen_public as _gen_public, new_private_key
+from keysec.actions.info import info as _info
+from keysec.iokeys import encodings, Key, terminated
+
+Data = Union[bytes, memoryview, str]
+Secret = Union[str, bytes]
+Passphrase = Optional[Union[Secret, Callable[[], Secret]]]
+
+__all__ = ['Key', 'load', 'load_public', 'convert', 'gen_private', 'gen_public', 'fingerprint', 'edit', 'info']
+
+
+def _secret(value: Secret) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _prompt(passphrase: Passphrase) -> Callable[[str], str]:
+    def prompt(_: str = '') -> str:
+        value = passphrase() if callable(passphrase) else passphrase
+        if value is None:
+            raise ValueError('key is encrypted and no passphrase was given')
+        return _secret(value)
+
+    return prompt
+
+
+def _out(data: bytes) -> bytes:
+    return terminated(data)
+
+
+def _encoding(name: Optional[str]):
+    if name is not None and name not in encodings:
+        raise ValueError(f'unknown encoding: {name}')
+    return encodings.get(name)
+
+
+def load(data: Data, passphrase: Passphrase = None) -> Key:
+    key = Key(prompt=_prompt(passphrase))
+    try:
+        key.load_key(key_data=data)
+    except ArgumentError as error:
+        raise ValueError(error.message) from None
+    return key
+
+
+def load_public(data: Data, passphrase: Passphrase = None) -> Key:
+    """Like load, but OpenSSH private keys only get their public half read, which needs no passphrase."""
+    key = Key(prompt=_prompt(passphrase))
+    try:
+        key.load_public(key_data=data)
+    except ArgumentError as error:
+        raise ValueError(error.message) from None
+    return key
+
+
+def convert(data: Data, passphrase: Passphrase = None, nopass: bool = False, kdf: str = None, rounds: int = None, new_passphrase: Secret = None,
+            encoding: str = None) -> bytes:
+    return _out(_convert(load(data, passphrase), nopass=nopass, kdf=kdf, rounds=rounds, password=_secret(new_passphrase), encoding=_encoding(encoding)))
+
+
+def gen_private(algorithm: str = 'ed25519', fmt: str = 'openssl', bits: int = None, new_passphrase: Secret = '', kdf: str = None, rounds: int = None,
+                encoding: str = None) -> bytes:
+    key = new_private_key(algorithm=algorithms[algorithm], bits=bits)
+    return _out(key.to_bytes(str_format=formats[fmt], password=_secret(new_passphrase), kdf=kdf, rounds=rounds, encoding=_encoding(encoding)))
+
+
+def gen_public(data: Data, passphrase: Passphrase = None, encoding: str = None, comment: bool = True) -> bytes:
+    """comment=False leaves the comment out, which spares the passphrase of encrypted OpenSSH keys, whose comment is encrypted."""
+    try:
+        key = load_public(data, passphrase)
+        if comment and key.public_only and key.encrypted:
+            key = load(data, passphrase)
+        return _out(_gen_public(key, encoding=_encoding(encoding), comment=comment))
+    except ArgumentError as error:
+        raise ValueError(error.message) from None
+
+
+def fingerprint(data: Data, passphrase: Passphrase = None) -> str:
+    return load_public(data, passphrase).get_fingerprint()
+
+
+def edit(data: Data, passphrase: Passphrase = None, comment: Union[None, str, Callable[[str], str]] = None, new_passphrase: Passphrase = None, kdf: str = None,
+         rounds: int = None, encoding: str = None) -> bytes:
+    """
+    comment may be a callable, which receives the current comment and returns the new one. new_passphrase None keeps the current passphrase,
+    while an empty one removes it; a callable is only asked for private keys. kdf, rounds and encoding default to the ones of the key.
+    """
+    key = load(data, passphrase)
+    if callable(new_passphrase):
+        new_passphrase = new_passphrase() if key.is_private() else None
+    if callable(comment):
+        comment = comment(key.get_ssh_comment()) if key.is_ssh() else None
+    return _out(_edit(key, comment=comment, password=_secret(new_passphrase) if new_passphrase is not None else False, kdf=kdf, rounds=rounds,
+                      encoding=_encoding(encoding)))
+
+
+def info(data: Data, passphrase: Passphrase = None, as_json: bool = False) -> bytes:
+    return _out(_info(load(data, passphrase), as_json=as_json))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import json
+import os
+import sys
+from argparse import ArgumentError
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from keysec.actions.gen import gen_files
+from keysec.iokeys import Key, make_private_dir, process, terminated, write_output
+from keysec.output import FileGroup, write_atomic, write_temp
+
+
+def no_prompt(prompt: str = '') -> str:
+    raise ValueError('key is encrypted and passphrases cannot be prompted when processing several keys, use --passin')
+
+
+def expand_inputs(paths: Iterable[str]) -> Iterator[Tuple[Path, Path]]:
+    # Yields every input file along with the relative name its output will get inside the output directory
+    for path in map(Path, paths):
+        if path.is_dir():
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file = Path(root, name)
+                    yield file, file.relative_to(path)
+        else:
+            yield path, Path(path.name)
+
+
+def duplicate_targets(items: List[Tuple[Path, Path]]) -> Set[Path]:
+    # Output names given to several inputs, such as a/id_rsa and b/id_rsa, which would overwrite one another inside the output directory
+    return {relname for relname, count in Counter(relname for _, relname in items).items() if count > 1}
+
+
+def given_passphrase(passphrase: str, prompt: str = '') -> str:
+    return passphrase
+
+
+Staged = Optional[Tuple[Path, Path]]
+
+
+def _work(item: Tuple[Path, Path], func: Callable[[Key, ...], bytes], outdir: Optional[Path], passphrase: Optional[str],
+          kwargs: dict) -> Tuple[Path, Optional[bytes], Staged, Optional[str]]:
+    # With outdir, the result is left in a temporary file next to its target, which the main process renames along with the rest of its group
+    path, relname = item
+    try:
+        res = process(path.read_bytes(), func, prompt=no_prompt if passphrase is None else partial(given_passphrase, passphrase), **kwargs)
+        if outdir is None:
+            return path, res, None, None
+        target = outdir.joinpath(relname)
+        make_private_dir(target.parent)
+        return path, None, (write_temp(target, terminated(res)), target), None
+    except ArgumentError as error:
+        return path, None, None, error.message
+    except Exception as error:
+        return path, None, None, str(error) or type(error).__name__
+
+
+def run_batch(inputs: Iterable[str], func: Callable[[Key, ...], bytes], output: BinaryIO, outdir: str = None, jobs: int = None, passphrase: str = None,
+              **kwargs) -> int:
+    # passphrase is the one of every encrypted input key, which otherwise cannot be processed since workers have no terminal
+    items = list(expand_inputs(inputs))
+    clashes = duplicate_targets(items) if outdir else set()
+    for path, relname in items:
+        if relname in clashes:
+            print(f'keysec: {path}: {relname} is also the output name of another input, give them different names', file=sys.stderr)
+    failures = sum(relname in clashes for _, relname in items)
+    items = [(path, relname) for path, relname in items if relname not in clashes]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(items)))
+    work = partial(_work, func=func, outdir=Path(outdir) if outdir else None, passphrase=passphrase, kwargs=kwargs)
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as pool, FileGroup() as group:
+        results = pool.map(work, items, chunksize=max(1, min(64, len(items) // (jobs * 4)))) if pool else map(work, items)
+        for path, res, staged, error in results:
+            if error is not None:
+                failures += 1
+                print(f'keysec: {path}: {error}', file=sys.stderr)
+            elif staged is not None:
+                group.add(*staged)
+            elif res is not None:
+                write_output(data=f'==> {path} <==\n'.encode('utf-8') + res, file=output, close=False)
+    if not output.name == '<stdout>':
+        output.close()
+    return failures
+
+
+def run_generate(count: int, outdir: str, name: str, public: bool = False, jobs: int = None, **kwargs) -> list:
+    jobs = max(1, min(jobs or os.cpu_count() or 1, count))
+    work = partial(gen_files, outdir=Path(outdir), name=name, public=public, **kwargs)
+    manifest = []
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as pool, FileGroup() as group:
+        for record, staged in pool.map(work, range(1, count + 1), chunksize=max(1, min(64, count // (jobs * 4)))) if pool else map(work, range(1, count + 1)):
+            manifest.append(record)
+            for tmp, path in staged:
+                group.add(tmp, path)
+    # Written once every key it lists is in place
+    make_private_dir(Path(outdir))
+    write_atomic(Path(outdir).joinpath('manifest.json'), json.dumps(manifest, indent=2).encode('utf-8') + b'\n')
+    return manifest
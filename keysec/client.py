@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import json
+import socket
+import struct
+from getpass import getpass
+from typing import Callable
+
+MAX_MESSAGE = 16 * 1024 * 1024
+
+
+def send_message(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack('>I', len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> dict:
+    size = struct.unpack('>I', _recv_exact(sock, 4))[0]
+    if size > MAX_MESSAGE:
+        raise ValueError('message too long')
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+def request(path: str, message: dict, prompt: Callable[[str], str] = getpass) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        send_message(sock, message)
+        response = recv_message(sock)
+        if response.get('password_required'):
+            send_message(sock, dict(message, password=prompt('Enter current key passphrase: ')))
+            response = recv_message(sock)
+    if not response.get('ok'):
+        raise ValueError(response.get('error') or 'Entered passphrase is incorrect.')
+    return response['result']
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from cryptography.hazmat.primitives.serialization import PrivateFormat
+
+from keysec.actions.info import key_type
+from keysec.batch import no_prompt
+from keysec.iokeys import Key, make_private_dir, sniff_key
+from keysec.stream import iter_records
+
+# Every key found under the indexed folders, keyed by fingerprint. Files are only parsed again when their size or mtime changed, and files
+# holding several keys (authorized_keys, PEM bundles) get one row per key.
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    line INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    private INTEGER NOT NULL,
+    algorithm TEXT,
+    bits INTEGER,
+    encrypted INTEGER NOT NULL,
+    comment TEXT,
+    fingerprint TEXT,
+    PRIMARY KEY (path, line)
+);
+CREATE INDEX IF NOT EXISTS keys_fingerprint ON keys(fingerprint);
+'''
+
+COLUMNS = ('path', 'line', 'format', 'private', 'algorithm', 'bits', 'encrypted', 'comment', 'fingerprint')
+
+
+def default_index() -> Path:
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')).joinpath('keysec', 'index.sqlite')
+
+
+def connect(db: Path) -> sqlite3.Connection:
+    make_private_dir(Path(db).parent)
+    connection = sqlite3.connect(db)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def describe(key_data: bytes) -> Optional[tuple]:
+    # (format, private, algorithm, bits, encrypted, comment, fingerprint) of a key, without asking for any passphrase
+    try:
+        kind = sniff_key(key_data.strip())
+    except ValueError:
+        return None
+    private = isinstance(kind.orig_format, PrivateFormat)
+    if kind.encrypted and kind.container is None:
+        return kind.orig_format.name, private, None, None, True, None, None
+    key = Key(prompt=no_prompt)
+    key.load_public(key_data=key_data)
+    comment = key.get_ssh_comment() if not kind.encrypted else None
+    return kind.orig_format.name, private, key_type(key).lower(), getattr(key.key, 'key_size', 256), kind.encrypted, comment, key.get_fingerprint()
+
+
+def file_keys(path: Path) -> Iterator[tuple]:
+    with open(path, mode='rb') as lines:
+        if b'\0' in lines.read(4096):  # binary file
+            return
+        lines.seek(0)
+        for record in iter_records(lines):
+            if record.passthrough:
+                continue
+            try:
+                description = describe(record.text)
+            except Exception:
+                continue
+            if description is not None:
+                yield (str(path), record.line, *description)
+
+
+def walk(paths: Iterable[str]) -> Iterator[Tuple[Path, os.stat_result]]:
+    for root in map(Path, paths):
+        if root.is_file():
+            yield root.resolve(), root.stat()
+            continue
+        for folder, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                path = Path(folder, name).resolve()
+                try:
+                    yield path, path.stat()
+                except OSError:
+                    continue
+
+
+def update(db: Path, paths: List[str]) -> dict:
+    counts = {'parsed': 0, 'unchanged': 0, 'removed': 0, 'keys': 0}
+    connection = connect(db)
+    with connection:
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in connection.execute('SELECT path, mtime_ns, size FROM files')}
+        seen = set()
+        for path, stat in walk(paths):
+            seen.add(str(path))
+            if known.get(str(path)) == (stat.st_mtime_ns, stat.st_size):
+                counts['unchanged'] += 1
+                continue
+            try:
+                rows = list(file_keys(path))
+            except OSError:
+                continue
+            connection.execute('DELETE FROM files WHERE path = ?', (str(path),))
+            connection.execute('INSERT INTO files VALUES (?, ?, ?)', (str(path), stat.st_mtime_ns, stat.st_size))
+            connection.executemany(f'INSERT INTO keys VALUES ({", ".join("?" * len(COLUMNS))})', rows)
+            counts['parsed'] += 1
+        # Files that disappeared from the indexed folders
+        roots = [str(Path(path).resolve()) for path in paths]
+        gone = [(path,) for path in known if path not in seen and any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)]
+        connection.executemany('DELETE FROM files WHERE path = ?', gone)
+        counts['removed'] = len(gone)
+        counts['keys'] = connection.execute('SELECT COUNT(*) FROM keys').fetchone()[0]
+    connection.close()
+    return counts
+
+
+def find(db: Path, fingerprint: str) -> List[dict]:
+    if not Path(db).is_file():
+        raise ValueError(f'there is no index at {db}, run keysec index first')
+    fingerprint = fingerprint if fingerprint.startswith('SHA256:') else f'SHA256:{fingerprint}'
+    connection = sqlite3.connect(f'file:{db}?mode=ro', uri=True)
+    try:
+        rows = connection.execute(f'SELECT {", ".join(COLUMNS)} FROM keys WHERE fingerprint = ? ORDER BY path, line', (fingerprint.rstrip('='),)).fetchall()
+    finally:
+        connection.close()
+    return [dict(zip(COLUMNS, row), private=bool(row[3]), encrypted=bool(row[6])) for row in rows]
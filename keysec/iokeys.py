@@ -2,30 +2,127 @@
 # encoding:utf-8
 
 
-import subprocess
+import base64
+import re
 from argparse import ArgumentError
 from getpass import getpass
-from io import TextIOWrapper
-from tempfile import NamedTemporaryFile, TemporaryFile
-from typing import Callable
+from pathlib import Path
+from typing import BinaryIO, Callable, NamedTuple
 from typing import Union
 
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey, EllipticCurvePublicKey
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
-from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, Encoding, load_pem_private_key, load_pem_public_key, load_ssh_private_key, load_ssh_public_key, NoEncryption, \
-    PrivateFormat, PublicFormat
+from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, Encoding, load_der_private_key, load_der_public_key, load_pem_private_key, load_pem_public_key, \
+    load_ssh_private_key, load_ssh_public_key, NoEncryption, PrivateFormat, PublicFormat
 
+from keysec import openssh, pkcs8, trace
 from keysec.parsers import in_arg
 
 
+_PEM_LABEL_RC = re.compile(rb'-----BEGIN ([A-Z0-9 ]+)-----')
+
+_pem_formats = {
+    'OPENSSH PRIVATE KEY': PrivateFormat.OpenSSH,
+    'ENCRYPTED PRIVATE KEY': PrivateFormat.PKCS8,
+    'PRIVATE KEY': PrivateFormat.PKCS8,
+    'RSA PRIVATE KEY': PrivateFormat.PKCS8,
+    'EC PRIVATE KEY': PrivateFormat.PKCS8,
+    'PUBLIC KEY': PublicFormat.SubjectPublicKeyInfo,
+    'RSA PUBLIC KEY': PublicFormat.SubjectPublicKeyInfo,
+}
+
+_loaders = {
+    PrivateFormat.PKCS8: load_pem_private_key,
+    PrivateFormat.OpenSSH: load_ssh_private_key,
+    PublicFormat.SubjectPublicKeyInfo: load_pem_public_key,
+    PublicFormat.OpenSSH: load_ssh_public_key,
+}
+
+_der_loaders = {
+    PrivateFormat.PKCS8: load_der_private_key,
+    PublicFormat.SubjectPublicKeyInfo: load_der_public_key,
+}
+
+encodings = {'pem': Encoding.PEM, 'der': Encoding.DER, 'raw': Encoding.Raw}
+
+# Raw Ed25519 keys: the 32 byte public key, or the 32 byte private seed followed by its public key, the layout of OpenSSH and libsodium, which
+# tells both apart and lets the private form be checked when loaded
+RAW_PUBLIC_LEN, RAW_PRIVATE_LEN = 32, 64
+
+
+class Binary(bytes):
+    """Key serialized in a binary encoding (DER, raw), written out as it is instead of followed by a newline like text keys."""
+
+
+def terminated(data: bytes) -> bytes:
+    return data if isinstance(data, Binary) else data + b'\n'
+
+
+class KeyKind(NamedTuple):
+    label: str
+    orig_format: Union[PrivateFormat, PublicFormat]
+    encrypted: bool
+    container: openssh.PrivateContainer = None
+    encoding: Encoding = Encoding.PEM
+
+
+def sniff_key(key_bytes: bytes) -> KeyKind:
+    match = _PEM_LABEL_RC.match(key_bytes)
+    if match:
+        label = match.group(1).decode('ascii')
+        if label not in _pem_formats:
+            raise ValueError(f'Unsupported PEM label: {label}')
+        if _pem_formats[label] is PrivateFormat.OpenSSH:
+            container = openssh.parse_private(key_bytes)
+            return KeyKind(label=label, orig_format=PrivateFormat.OpenSSH, encrypted=container.is_encrypted(), container=container)
+        encrypted = label == 'ENCRYPTED PRIVATE KEY' or b'Proc-Type: 4,ENCRYPTED' in key_bytes
+        return KeyKind(label=label, orig_format=_pem_formats[label], encrypted=encrypted)
+    key_type = key_bytes.split(maxsplit=1)[0] if key_bytes else b''
+    if key_type in openssh.KEY_TYPES:
+        return KeyKind(label=key_type.decode('ascii'), orig_format=PublicFormat.OpenSSH, encrypted=False, encoding=Encoding.OpenSSH)
+    # Binary keys: DER is told apart by its structure, raw Ed25519 keys by their size
+    label = pkcs8.der_label(key_bytes)
+    if label is not None:
+        return KeyKind(label=label, orig_format=_pem_formats[label], encrypted=label == 'ENCRYPTED PRIVATE KEY', encoding=Encoding.DER)
+    if _is_text(key_bytes):  # lines of text the size of a raw key, in streams and key files
+        raise ValueError('Unknown key format')
+    if len(key_bytes) == RAW_PRIVATE_LEN:
+        return KeyKind(label='ED25519 RAW PRIVATE KEY', orig_format=PrivateFormat.PKCS8, encrypted=False, encoding=Encoding.Raw)
+    if len(key_bytes) == RAW_PUBLIC_LEN:
+        return KeyKind(label='ED25519 RAW PUBLIC KEY', orig_format=PublicFormat.SubjectPublicKeyInfo, encrypted=False, encoding=Encoding.Raw)
+    raise ValueError('Unknown key format')
+
+
+def _is_text(data: bytes) -> bool:
+    return data.isascii() and data.decode('ascii').isprintable()
+
+
+def _load_raw(key_bytes: bytes) -> Union[Ed25519PrivateKey, Ed25519PublicKey]:
+    if len(key_bytes) == RAW_PUBLIC_LEN:
+        return Ed25519PublicKey.from_public_bytes(key_bytes)
+    key = Ed25519PrivateKey.from_private_bytes(key_bytes[:32])
+    if key.public_key().public_bytes(encoding=Encoding.Raw, format=PublicFormat.Raw) != key_bytes[32:]:
+        raise ValueError('the public half of the raw key does not match its seed')
+    return key
+
+
 class Key:
-    def __init__(self):
-        self.orig_str: str = None
-        self.key: Union[Ed25519PrivateKey, Ed25519PublicKey, RSAPrivateKey, RSAPublicKey] = None
+    def __init__(self, prompt: Callable[[str], str] = getpass):
+        self.prompt = prompt
+        self.orig_bytes: bytes = None
+        self.key: Union[Ed25519PrivateKey, Ed25519PublicKey, EllipticCurvePrivateKey, EllipticCurvePublicKey, RSAPrivateKey, RSAPublicKey] = None
         self.orig_format: Union[PrivateFormat, PublicFormat] = None
         self.password: str = ''
         self.comment: str = None
         self.fingerprint: str = None
+        self.public_blob: bytes = None
+        self.label: str = None
+        self.encrypted: bool = False
+        self.kdf: str = None
+        self.kdf_rounds: int = None
+        self.public_only: bool = False  # only the public half of a private key was read, see load_public
+        self.encoding: Encoding = Encoding.PEM  # of the loaded key, kept by to_bytes along with its format
 
     def is_ssh(self) -> bool:
         return self.orig_format is PrivateFormat.OpenSSH or self.orig_format is PublicFormat.OpenSSH
@@ -36,98 +133,211 @@ class Key:
     def is_public(self) -> bool:
         return isinstance(self.orig_format, PublicFormat)
 
-    def load_key(self, key_str: str):
+    def public_key(self):
+        return self.key.public_key() if self.is_private() and not self.public_only else self.key
+
+    def load_key(self, key_data: Union[bytes, memoryview, str]):
+        if self.key is not None:
+            return
+        with trace.span('load_key'):
+            self._load(key_data)
+
+    def load_public(self, key_data: Union[bytes, memoryview, str]):
+        # OpenSSH private keys carry their public half in the clear, so it is read from there without asking for the passphrase or running the
+        # KDF. Any other key is fully loaded.
         if self.key is not None:
             return
-        self.orig_str = key_str.strip()
-        key_bytes = key_str.encode('utf-8')
-        loaded_key, orig_format, password = None, None, ''
-        funcs = ((load_pem_private_key, PrivateFormat.PKCS8), (load_ssh_private_key, PrivateFormat.OpenSSH),
-                 (load_pem_public_key, PublicFormat.SubjectPublicKeyInfo), (load_ssh_public_key, PublicFormat.OpenSSH))
-        for load in funcs:
+        key_bytes = key_bytes_of(key_data)
+        try:
+            kind = sniff_key(key_bytes)
+        except ValueError:
+            kind = None
+        if kind is None or kind.container is None:
+            return self.load_key(key_bytes)
+        with trace.span('load_public', label=kind.label, encrypted=kind.encrypted):
             try:
-                loaded_key, orig_format = load[0](key_bytes, password=None) if isinstance(load[1], PrivateFormat) else load[0](key_bytes), load[1]
-                break
-            except (ValueError, TypeError) as error:
-                if error.args[0] == 'Key is password-protected.' or error.args[0] == 'Password was not given but private key is encrypted':
-                    password = getpass('Enter current key passphrase: ')
-                    try:
-                        loaded_key, orig_format = load[0](key_bytes, password=password.encode('utf-8')), load[1]
-                        break
-                    except:
-                        raise ValueError('Entered passphrase is incorrect.') from None
-            except:
-                pass
-        if loaded_key is None:
-            raise ArgumentError(argument=in_arg, message='input is not an OpenSSL or OpenSSH ASCII-encoded key')
-        self.key, self.orig_format, self.password = loaded_key, orig_format, password
+                key_type, _ = openssh.get_sshstr(memoryview(kind.container.public_blob))
+                self.key = load_ssh_public_key(key_type.tobytes() + b' ' + base64.b64encode(kind.container.public_blob))
+                # The comment is stored along with the private fields, so it is only known when they are not encrypted
+                self.comment = '' if kind.encrypted else openssh.private_comment(openssh.decrypt_private(kind.container, b''))
+            except Exception:
+                raise ArgumentError(argument=in_arg, message='input is not an OpenSSL or OpenSSH key') from None
+            self.orig_bytes, self.orig_format, self.label, self.encrypted, self.public_only = key_bytes, kind.orig_format, kind.label, kind.encrypted, True
+            self.public_blob, self.fingerprint = kind.container.public_blob, openssh.fingerprint(kind.container.public_blob)
+            self._kdf_params(kind, key_bytes)
+
+    def _load(self, key_data: Union[bytes, memoryview, str]):
+        key_bytes = self.orig_bytes = key_bytes_of(key_data)
+        try:
+            kind = sniff_key(key_bytes)
+        except ValueError:
+            raise ArgumentError(argument=in_arg, message='input is not an OpenSSL or OpenSSH key') from None
+        with trace.span('prompt'):
+            password = self.prompt('Enter current key passphrase: ') if kind.encrypted else ''
+        try:
+            with trace.span('parse', label=kind.label, encrypted=kind.encrypted):
+                loaders = _der_loaders if kind.encoding is Encoding.DER else _loaders
+                if kind.container is not None:
+                    loaded_key = self._load_openssh_private(kind.container, password)
+                elif kind.encoding is Encoding.Raw:
+                    loaded_key = _load_raw(key_bytes)
+                elif isinstance(kind.orig_format, PrivateFormat):
+                    loaded_key = loaders[kind.orig_format](key_bytes, password=password.encode('utf-8') if kind.encrypted else None)
+                else:
+                    loaded_key = loaders[kind.orig_format](key_bytes)
+        except Exception:
+            if kind.encrypted:
+                raise ValueError('Entered passphrase is incorrect.') from None
+            raise ArgumentError(argument=in_arg, message='input is not an OpenSSL or OpenSSH key') from None
+        self.key, self.orig_format, self.label, self.encrypted, self.password = loaded_key, kind.orig_format, kind.label, kind.encrypted, password
+        self.encoding = kind.encoding
+        self._kdf_params(kind, key_bytes)
+
+    def _kdf_params(self, kind: KeyKind, key_bytes: bytes):
+        if kind.container is not None and kind.encrypted:
+            self.kdf, self.kdf_rounds = kind.container.kdf.decode('ascii'), kind.container.rounds
+        elif kind.label == 'ENCRYPTED PRIVATE KEY':
+            self.kdf, self.kdf_rounds = pkcs8.kdf_params(key_bytes)
+        elif kind.encrypted:
+            self.kdf, self.kdf_rounds = 'pem-md5', 1  # legacy Proc-Type encryption, the key is a single MD5 of the passphrase and IV
+
+    def _load_openssh_private(self, container: openssh.PrivateContainer, password: str):
+        # Decrypt only once: the comment is taken from the plain section, which is then handed to cryptography unencrypted
+        plain = openssh.decrypt_private(container, password.encode('utf-8'))
+        self.public_blob, self.comment = container.public_blob, openssh.private_comment(plain)
+        self.fingerprint = openssh.fingerprint(self.public_blob)
+        return load_ssh_private_key(openssh.unencrypted(container, plain), password=None)
 
     def get_ssh_comment(self) -> str:
         if self.comment is not None or not self.is_ssh():
             return self.comment
-        public = self.orig_str
         if self.orig_format is PrivateFormat.OpenSSH:
-            with NamedTemporaryFile(mode='w+', encoding='utf-8') as tmp:
-                write_output(self.orig_str, tmp, close=False)
-                public = subprocess.run(['ssh-keygen', '-y', '-P', self.password, '-f', tmp.name], capture_output=True, text=True, check=True).stdout
-        with TemporaryFile(mode='w+', encoding='utf-8') as tmp:
-            write_output(public, tmp, close=False)
-            tmp.seek(0)
-            info = subprocess.run(['ssh-keygen', '-l', '-f', '-'], capture_output=True, text=True, check=True, stdin=tmp).stdout
-        self.comment = ' '.join(info.split(' ')[2:-1])
-        self.fingerprint = info.split(' ')[1]
+            container = openssh.parse_private(self.orig_bytes)
+            self.public_blob = container.public_blob
+            self.comment = openssh.private_comment(openssh.decrypt_private(container, self.password.encode('utf-8')))
+        else:
+            _, self.public_blob, self.comment = openssh.parse_public(self.orig_bytes)
+        self.fingerprint = openssh.fingerprint(self.public_blob)
         return self.comment
 
-    def get_ssh_fingerprint(self) -> str:
+    def get_ssh_fingerprint(self, digest: str = 'sha256') -> str:
         self.get_ssh_comment()
-        return self.fingerprint
+        if self.fingerprint is None or digest == 'sha256':
+            return self.fingerprint
+        return openssh.fingerprint(self.public_blob, digest=digest)
+
+    def get_fingerprint(self, digest: str = 'sha256') -> str:
+        # Same fingerprint as ssh-keygen -l, whatever the format of the key
+        if self.is_ssh():
+            return self.get_ssh_fingerprint(digest=digest)
+        return openssh.fingerprint(openssh.public_blob(self.public_key()), digest=digest)
+
+    def to_bytes(self, str_format: Union[PrivateFormat, PublicFormat] = None, comment: str = None, password: str = None, kdf: str = None, rounds: int = None,
+                 encoding: Encoding = None) -> bytes:
+        """encoding defaults to text (PEM, OpenSSH), or to the encoding of the key itself when its format is kept. Binary results are Binary."""
+        with trace.span('to_bytes'):
+            str_format = str_format if str_format is not None else self.orig_format
+            encoding = encoding or (self.encoding if str_format is self.orig_format else Encoding.PEM)
+            if encoding is Encoding.PEM or encoding is Encoding.OpenSSH:
+                return self._to_bytes(str_format, comment, password, kdf, rounds)
+            return Binary(self._to_binary(str_format, password, kdf, rounds, encoding))
 
-    def to_str(self, str_format: Union[PrivateFormat, PublicFormat] = None, comment: str = None, password: str = None) -> str:
-        str_format = str_format if str_format is not None else self.orig_format
+    def _to_binary(self, str_format: Union[PrivateFormat, PublicFormat], password: str, kdf: str, rounds: int, encoding: Encoding) -> bytes:
         password = password if password is not None else self.password
+        if isinstance(str_format, PrivateFormat) and (self.is_public() or self.public_only):
+            raise ValueError('cannot convert a public key into a private one' if self.is_public() else 'only the public half of the key was loaded')
+        if encoding is Encoding.Raw:
+            # Raw keys have no format, OpenSSH or OpenSSL, and no room for a passphrase
+            if not isinstance(self.key, (Ed25519PrivateKey, Ed25519PublicKey)):
+                raise ValueError('only Ed25519 keys have a raw encoding')
+            public = self.public_key().public_bytes(encoding=Encoding.Raw, format=PublicFormat.Raw)
+            if not isinstance(str_format, PrivateFormat):
+                return public
+            if password:
+                raise ValueError('raw private keys cannot be encrypted, remove the passphrase first')
+            return self.key.private_bytes(encoding=Encoding.Raw, format=PrivateFormat.Raw, encryption_algorithm=NoEncryption()) + public
+        if str_format is PrivateFormat.OpenSSH or str_format is PublicFormat.OpenSSH:
+            raise ValueError('OpenSSH keys have no DER encoding, use the OpenSSL format')
+        if not isinstance(str_format, PrivateFormat):
+            return self.public_key().public_bytes(encoding=Encoding.DER, format=PublicFormat.SubjectPublicKeyInfo)
+        if str_format is self.orig_format and self.kdf in pkcs8.KDFS:
+            kdf = kdf or self.kdf
+            rounds = rounds if rounds is not None else (self.kdf_rounds if kdf == self.kdf else None)
+        if password and (kdf in pkcs8.KDFS or rounds):
+            return pkcs8.serialize_private(self.key, password=password.encode('utf-8'), kdf=kdf if kdf in pkcs8.KDFS else pkcs8.PBKDF2, rounds=rounds, encoding=Encoding.DER)
+        encryption = BestAvailableEncryption(password.encode('utf-8')) if password else NoEncryption()
+        return self.key.private_bytes(encoding=Encoding.DER, format=PrivateFormat.PKCS8, encryption_algorithm=encryption)
+
+    def _to_bytes(self, str_format: Union[PrivateFormat, PublicFormat], comment: str, password: str, kdf: str, rounds: int) -> bytes:
+        password = password if password is not None else self.password
+        if str_format is self.orig_format and self.kdf in ('bcrypt', *pkcs8.KDFS):  # keep the KDF cost of the key unless told otherwise
+            kdf = kdf or self.kdf
+            rounds = rounds if rounds is not None else (self.kdf_rounds if kdf == self.kdf else None)
         encoding = Encoding.OpenSSH if str_format is PublicFormat.OpenSSH else Encoding.PEM
 
+        if self.is_ssh() and str_format in (PrivateFormat.OpenSSH, PublicFormat.OpenSSH):
+            comment = comment if comment is not None else self.get_ssh_comment()
+
         if isinstance(str_format, PrivateFormat):
             if self.is_public():
                 raise ValueError('cannot convert a public key into a private one')
-            if password:
+            if self.public_only:
+                raise ValueError('only the public half of the key was loaded')
+            if comment and (str_format is PrivateFormat.OpenSSH):
+                return openssh.serialize_private(self.key, password=password.encode('utf-8'), comment=comment, rounds=rounds or openssh.DEFAULT_ROUNDS)
+            if password and str_format is PrivateFormat.PKCS8 and (kdf in pkcs8.KDFS or rounds):
+                return pkcs8.serialize_private(self.key, password=password.encode('utf-8'), kdf=kdf if kdf in pkcs8.KDFS else pkcs8.PBKDF2, rounds=rounds)
+            if password and str_format is PrivateFormat.OpenSSH and rounds:
+                res = self.key.private_bytes(encoding=encoding, format=str_format, encryption_algorithm=str_format.encryption_builder().kdf_rounds(rounds).build(password.encode('utf-8')))
+            elif password:
                 res = self.key.private_bytes(encoding=encoding, format=str_format, encryption_algorithm=BestAvailableEncryption(password.encode('utf-8')))
             else:
                 res = self.key.private_bytes(encoding=encoding, format=str_format, encryption_algorithm=NoEncryption())
         else:
-            if self.is_private():
-                res = self.key.public_key().public_bytes(encoding=encoding, format=str_format)
-            else:
-                res = self.key.public_bytes(encoding=encoding, format=str_format)
-        res = res.decode('utf-8').strip()
+            res = self.public_key().public_bytes(encoding=encoding, format=str_format)
+        res = res.strip()
 
-        if self.is_ssh() and str_format in (PrivateFormat.OpenSSH, PublicFormat.OpenSSH):
-            comment = comment if comment is not None else self.get_ssh_comment()
         if comment and (str_format is PublicFormat.OpenSSH):
-            res += f' {comment}'
-        elif comment and (str_format is PrivateFormat.OpenSSH):
-            with NamedTemporaryFile(mode='w+', encoding='utf-8') as tmp:
-                write_output(res, tmp, close=False)
-                subprocess.run(['ssh-keygen', '-c', '-C', comment, '-P', password, '-f', tmp.name], capture_output=True, text=True, check=True)
-                tmp.seek(0)
-                res = tmp.read().strip()
+            res += b' ' + comment.encode('utf-8')
         return res
 
 
-def write_output(text: str, file: TextIOWrapper, close=True):
-    file.write(text + '\n')
-    file.flush()
-    if close and not file.name == '<stdout>':
-        file.close()
+def key_bytes_of(key_data: Union[bytes, memoryview, str]) -> bytes:
+    # Keys are handled as bytes all along, str input is only accepted for library callers. Surrounding whitespace is only dropped from text keys,
+    # binary ones are kept as they are
+    data = key_data.encode('utf-8') if isinstance(key_data, str) else bytes(key_data)
+    text = data.strip()
+    if text.startswith(b'-----') or (text and text.split(maxsplit=1)[0] in openssh.KEY_TYPES):
+        return text
+    return data
+
 
+def write_output(data: bytes, file: BinaryIO, close=True):
+    with trace.span('write_output'):
+        file.write(terminated(data))
+        file.flush()
+        if close and not file.name == '<stdout>':
+            file.close()
 
-def generate_and_write(output: TextIOWrapper, func: Callable[..., str], *args, **kwargs):
+
+def make_private_dir(path: Path):
+    # The process umask is 0o177, so every missing level is created and then opened up to 0o700
+    for folder in reversed((path, *path.parents)):
+        if not folder.exists():
+            try:
+                folder.mkdir()
+            except FileExistsError:
+                continue
+            folder.chmod(0o700)
+
+
+def generate_and_write(output: BinaryIO, func: Callable[..., bytes], *args, **kwargs):
     key = func(*args, **kwargs)
-    write_output(text=key, file=output)
+    write_output(data=key, file=output)
+
 
+def process(key_data: bytes, func: Callable[[Key, ...], bytes], *args, prompt: Callable[[str], str] = getpass, **kwargs) -> bytes:
+    key = Key(prompt=prompt)
+    key.load_key(key_data=key_data)
+    return func(key, *args, **kwargs)
 
-def full_process(key_str: str, output: TextIOWrapper, func: Callable[[Key, ...], str], *args, **kwargs):
-    key = Key()
-    key.load_key(key_str=key_str)
-    res = func(key, *args, **kwargs)
-    write_output(text=res, file=output)
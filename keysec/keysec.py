@@ -5,30 +5,312 @@
 import os
 import sys
 
-from keysec.actions import convert, edit, gen_private, gen_public, info
-from keysec.iokeys import full_process, generate_and_write
-from keysec.parsers import ARGS, generate_parser, parse_args, top_parser
+from keysec import trace
+from keysec.parsers import ARGS, parse_args, top_parser
 
-sys.tracebacklimit = 0
+# Action modules, and therefore cryptography, are only imported once the chosen subcommand is known. Single keys go through keysec.api, the CLI only
+# adds prompting, files and batch processing on top of it.
 
-os.umask(0o177)  # chmod 600
+
+def ask_passphrase() -> str:
+    from getpass import getpass
+    return getpass('Enter current key passphrase: ')
+
+
+def current_passphrase():
+    # Asks for the passphrase of encrypted input keys, unless --passin gives it, in which case it is read once for the whole invocation
+    if ARGS.PASSIN is None:
+        return ask_passphrase
+    from keysec.prompt import passphrase_source
+    return passphrase_source(ARGS.PASSIN)
+
+
+def new_passphrase(ask: bool):
+    # Passphrase of output keys: from --passout, asked for when ask is set, or None to keep the current one
+    from keysec.prompt import ask_new_password, passphrase_source
+    if ARGS.PASSOUT is not None:
+        return passphrase_source(ARGS.PASSOUT)()
+    return ask_new_password() if ask else None
+
+
+def ask_comment(old: str) -> str:
+    from keysec.prompt import safe_input, safe_print
+    safe_print(f'Old comment: {old}')
+    return safe_input('New comment: ')
+
+
+def output_encoding():
+    from keysec.iokeys import encodings
+    return encodings.get(ARGS.ENCODING)
+
+
+def write_result(data: bytes):
+    with trace.span('write_output'):
+        ARGS.OUT.write(data)
+        ARGS.OUT.flush()
+        if not ARGS.OUT.name == '<stdout>':
+            ARGS.OUT.close()
+
+
+def process_batch(func, **kwargs):
+    from keysec.batch import run_batch
+    passphrase = current_passphrase()() if ARGS.PASSIN is not None else None
+    failures = run_batch(inputs=ARGS.INPUTS, func=func, output=ARGS.OUT, outdir=ARGS.OUTDIR, jobs=ARGS.JOBS, passphrase=passphrase, **kwargs)
+    sys.exit(1) if failures else None
+
+
+def process_multi(func, passthrough=False, **kwargs):
+    from keysec.batch import expand_inputs
+    from keysec.stream import process_stream
+    if ARGS.OUTDIR:
+        top_parser.error('--outdir cannot be used with --multi or --list, every key goes to the same output')
+    failures = 0
+    for path, _ in expand_inputs(ARGS.INPUTS) if ARGS.INPUTS else [(None, None)]:
+        try:
+            lines = open(path, mode='rb') if path else sys.stdin.buffer
+        except OSError as error:
+            failures += 1
+            print(f'keysec: {path}: {error.strerror}', file=sys.stderr)
+            continue
+        with lines:
+            failures += process_stream(lines, func, output=ARGS.OUT, source=str(path or '<stdin>'), passthrough=passthrough, prompt=current_passphrase(), **kwargs)
+    ARGS.OUT.flush()
+    if not ARGS.OUT.name == '<stdout>':
+        ARGS.OUT.close()
+    sys.exit(1) if failures else None
+
+
+def remote_request() -> dict:
+    if ARGS.BATCH or ARGS.MULTI or (ARGS.PRIVATE and (ARGS.COUNT is not None or ARGS.FROM_POOL)) or ARGS.POOL or ARGS.SERVE:
+        top_parser.error('--connect only supports single-key gen, conv, edit and info commands')
+    if ARGS.ENCODING not in (None, 'pem'):
+        top_parser.error('--connect only returns text keys, binary encodings cannot be used with it')
+    kdf = {'kdf': ARGS.KDF, 'kdf_rounds': ARGS.KDF_ROUNDS}
+    key = ARGS.IN.decode('utf-8') if ARGS.IN is not None else None  # messages are JSON
+    if ARGS.PRIVATE:
+        return {'op': 'gen_private', 'algorithm': ARGS.ALGORITHM, 'format': ARGS.FORMAT, 'bits': ARGS.BITS, 'new_password': new_passphrase(ARGS.PASSWORD), **kdf}
+    if ARGS.PUBLIC:
+        return {'op': 'gen_public', 'key': key, 'comment': not ARGS.NOCOMMENT}
+    if ARGS.CONVERT:
+        return {'op': 'conv', 'key': key, 'nopass': ARGS.NOPASS, 'new_password': new_passphrase(False), **kdf}
+    if ARGS.EDIT:
+        from keysec.prompt import safe_input
+        comment = safe_input('New comment: ') if ARGS.COMMENT is True else ARGS.COMMENT
+        return {'op': 'edit', 'key': key, 'comment': comment, 'new_password': new_passphrase(ARGS.PASSWORD), **kdf}
+    if ARGS.INFO:
+        return {'op': 'info', 'key': key, 'json': ARGS.JSON}
+    top_parser.print_help()
+    sys.exit(0)
+
+
+def generate():
+    from keysec.actions.gen import algorithms, formats, key_bits
+    from keysec.parsers.gen import private_parser
+    algorithm, dst_format = algorithms[ARGS.ALGORITHM], formats[ARGS.FORMAT]
+    try:
+        ARGS.BITS = key_bits(algorithm, ARGS.BITS)
+    except ValueError as error:
+        private_parser.error(str(error))
+    encryption = {'password': new_passphrase(ARGS.PASSWORD) or '', 'kdf': ARGS.KDF, 'rounds': ARGS.KDF_ROUNDS, 'encoding': output_encoding()}
+    if ARGS.COUNT is not None:
+        from keysec.batch import run_generate
+        if ARGS.OUTDIR is None or '{n' not in ARGS.NAME:
+            private_parser.error('--count requires --outdir and a --name template containing {n}')
+        if ARGS.FROM_POOL:
+            private_parser.error('--from-pool takes a single key, it cannot be used with --count')
+        run_generate(count=ARGS.COUNT, outdir=ARGS.OUTDIR, name=ARGS.NAME, public=ARGS.WITH_PUBLIC, jobs=ARGS.JOBS, algorithm=algorithm, dst_format=dst_format, bits=ARGS.BITS,
+                     **encryption)
+    elif ARGS.FROM_POOL:
+        from keysec.iokeys import generate_and_write
+        from keysec.pool import default_spool, gen_pooled
+        generate_and_write(output=ARGS.OUT, func=gen_pooled, spool=ARGS.SPOOL or default_spool(), algorithm=algorithm, dst_format=dst_format, bits=ARGS.BITS,
+                           **encryption)
+    else:
+        from keysec import api
+        write_result(api.gen_private(algorithm=ARGS.ALGORITHM, fmt=ARGS.FORMAT, bits=ARGS.BITS, new_passphrase=encryption['password'], kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS,
+                                     encoding=ARGS.ENCODING))
+
+
+def edit():
+    from keysec.parsers.edit import edit_parser
+    if ARGS.BATCH:
+        from keysec.actions.edit import edit
+        if ARGS.COMMENT is True:
+            edit_parser.error('the comment must be given explicitly when editing several keys')
+        password = new_passphrase(ARGS.PASSWORD)
+        process_batch(func=edit, comment=ARGS.COMMENT, password=password if password is not None else False, kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS,
+                      encoding=output_encoding())
+    else:
+        from keysec import api
+        comment = ask_comment if ARGS.COMMENT is True else ARGS.COMMENT
+        from keysec.prompt import ask_new_password
+        password = new_passphrase(False) if ARGS.PASSOUT is not None else ask_new_password if ARGS.PASSWORD else None
+        write_result(api.edit(ARGS.IN, passphrase=current_passphrase(), comment=comment, new_passphrase=password,
+                              kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS, encoding=ARGS.ENCODING))
+
+
+def find():
+    from keysec.index import default_index, find
+    if ARGS.PUBLIC_KEY is not None:
+        from keysec import api
+        fingerprint = api.fingerprint(ARGS.PUBLIC_KEY.read(), passphrase=ask_passphrase)
+    else:
+        fingerprint = ARGS.FINGERPRINT
+    try:
+        matches = find(ARGS.DB or default_index(), fingerprint)
+    except ValueError as error:
+        top_parser.error(str(error))
+    if ARGS.JSON:
+        import json
+        print(*(json.dumps(match) for match in matches), sep='\n') if matches else None
+    else:
+        print(*(f'{match["path"]}:{match["line"]}' for match in matches), sep='\n') if matches else None
+    sys.exit(0 if matches else 1)
+
+
+def sign():
+    from argparse import ArgumentError
+    from keysec.iokeys import Key
+    from keysec.parsers.sign import sign_parser
+    from keysec.sign import ca_bytes, load_ca, parse_options, parse_validity, sign_files, sign_record
+    if ARGS.OUTDIR and not ARGS.INPUTS:
+        sign_parser.error('--outdir requires the public keys to be given with --in or --from0')
+    cert_type = 'host' if ARGS.HOST else 'user'
+    try:
+        critical, extensions = parse_options(ARGS.OPTIONS, cert_type=cert_type)
+    except ValueError as error:
+        sign_parser.error(str(error))
+    try:
+        for template in (ARGS.IDENTITY, *ARGS.PRINCIPALS):
+            template.format(name='', comment='', serial=0)
+    except (KeyError, IndexError, ValueError) as error:
+        sign_parser.error(f'invalid field {error} in --identity or --principals')
+    try:
+        valid_after, valid_before = parse_validity(ARGS.VALIDITY or 'always:forever')
+    except ValueError as error:
+        sign_parser.error(f'argument --validity/-V: {error}')
+    ca = Key(prompt=current_passphrase())
+    try:
+        ca.load_key(key_data=ARGS.CA.read())
+        ca_der = ca_bytes(ca)
+    except ArgumentError as error:
+        sign_parser.error(f'argument --ca/-s: {error.message}')
+    except ValueError as error:
+        sign_parser.error(f'argument --ca/-s: {error}')
+    spec = {'type': cert_type, 'identity': ARGS.IDENTITY, 'principals': ARGS.PRINCIPALS, 'valid_after': valid_after, 'valid_before': valid_before,
+            'serial': ARGS.SERIAL, 'critical': critical, 'extensions': extensions}
+    if ARGS.INPUTS:
+        import json
+        errors = []
+        manifest = sign_files(ARGS.INPUTS, ca_der, spec, outdir=ARGS.OUTDIR, jobs=ARGS.JOBS, errors=errors)
+        for path, error in errors:
+            print(f'keysec: {path}: {error}', file=sys.stderr)
+        write_result(json.dumps(manifest, indent=2).encode('utf-8') + b'\n')
+    else:
+        from itertools import count
+        from keysec.stream import process_stream
+        load_ca(ca_der)
+        errors = process_stream(sys.stdin.buffer, sign_record, output=ARGS.OUT, source='<stdin>', public=True, spec=spec, serials=count(ARGS.SERIAL))
+        write_result(b'')
+    sys.exit(1) if errors else None
+
+
+def audit():
+    from keysec.audit import audit, to_csv, to_json
+    errors = []
+    keys, summary = audit(ARGS.PATHS, min_rsa_bits=ARGS.BITS, jobs=ARGS.JOBS, errors=errors)
+    for path, error in errors:
+        print(f'keysec: {path}: {error}', file=sys.stderr)
+    if ARGS.FORMAT == 'csv':
+        counts = {name: count for name, count in summary.items() if name != 'issues'}
+        counts.update(summary['issues'])
+        print('keysec: ' + ', '.join(f'{name.replace("_", " ")}: {count}' for name, count in counts.items()), file=sys.stderr)
+        write_result(to_csv(keys) + b'\n')
+    else:
+        write_result(to_json(keys, summary) + b'\n')
+    sys.exit(1 if summary['with_issues'] else 0)
 
 
 def main():
-    parse_args()
-    if ARGS.GENERATE:
+    trace.begin()
+    sys.tracebacklimit = 0
+    os.umask(0o177)  # chmod 600
+    with trace.span('parse_args'):
+        parse_args()
+    trace.configure(ARGS.TRACE)
+    with trace.span('command', command=ARGS.COMMAND or None):
+        run()
+
+
+def run():
+    if ARGS.CONNECT:
+        from keysec.client import request
+        message = remote_request()
+        write_result(request(ARGS.CONNECT, message, prompt=current_passphrase()).encode('utf-8'))
+    elif ARGS.GENERATE:
         if ARGS.PRIVATE:
-            generate_and_write(output=ARGS.OUT, func=gen_private, algorithm=ARGS.ALGORITHM, dst_format=ARGS.FORMAT, bits=ARGS.BITS)
+            generate()
         elif ARGS.PUBLIC:
-            full_process(key_str=ARGS.IN, output=ARGS.OUT, func=gen_public)
+            from keysec import api
+            write_result(api.gen_public(ARGS.IN, passphrase=current_passphrase(), encoding=ARGS.ENCODING, comment=not ARGS.NOCOMMENT))
         else:
+            from keysec.parsers.gen import generate_parser
             generate_parser.print_help()
     elif ARGS.CONVERT:
-        full_process(key_str=ARGS.IN, output=ARGS.OUT, func=convert, nopass=ARGS.NOPASS)
+        if ARGS.MULTI:
+            from keysec.stream import convert_record
+            if ARGS.ENCODING not in (None, 'pem'):
+                top_parser.error('--multi writes every key to the same text stream, binary encodings cannot be used with it')
+            process_multi(func=convert_record, passthrough=True, nopass=ARGS.NOPASS, kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS, password=new_passphrase(False))
+        elif ARGS.BATCH:
+            from keysec.actions.conv import convert
+            process_batch(func=convert, nopass=ARGS.NOPASS, kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS, password=new_passphrase(False), encoding=output_encoding())
+        else:
+            from keysec import api
+            write_result(api.convert(ARGS.IN, passphrase=current_passphrase(), nopass=ARGS.NOPASS, kdf=ARGS.KDF, rounds=ARGS.KDF_ROUNDS,
+                                     new_passphrase=new_passphrase(False), encoding=ARGS.ENCODING))
     elif ARGS.EDIT:
-        full_process(key_str=ARGS.IN, output=ARGS.OUT, func=edit, comment=ARGS.COMMENT, password=ARGS.PASSWORD)
+        edit()
     elif ARGS.INFO:
-        full_process(key_str=ARGS.IN, output=ARGS.OUT, func=info)
+        if ARGS.MULTI:
+            from keysec.stream import fingerprint_record, info_record
+            process_multi(func=fingerprint_record, public=True) if ARGS.LIST else process_multi(func=info_record, as_json=ARGS.JSON)
+        elif ARGS.BATCH:
+            from keysec.actions.info import info
+            process_batch(func=info, as_json=ARGS.JSON)
+        else:
+            from keysec import api
+            write_result(api.info(ARGS.IN, passphrase=current_passphrase(), as_json=ARGS.JSON))
+    elif ARGS.SIGN:
+        sign()
+    elif ARGS.AUDIT:
+        audit()
+    elif ARGS.INDEX:
+        from keysec.index import default_index, update
+        counts = update(ARGS.DB or default_index(), ARGS.PATHS)
+        if ARGS.JSON:
+            import json
+            print(json.dumps(counts))
+        else:
+            print(f'{counts["keys"]} keys indexed, {counts["parsed"]} files parsed, {counts["unchanged"]} unchanged, {counts["removed"]} removed')
+    elif ARGS.FIND:
+        find()
+    elif ARGS.POOL:
+        from keysec.actions.gen import algorithms
+        from keysec.parsers.pool import pool_parser
+        from keysec.pool import default_spool, serve_pool
+        kinds = [(algorithm, bits) for algorithm, bits, _ in ARGS.STOCK]
+        for algorithm, bits in (kind for n, kind in enumerate(kinds) if kind in kinds[:n]):
+            pool_parser.error(f'argument --stock/-s: {algorithm}:{bits} is given more than once')
+        stock = [(algorithms[algorithm], bits, count) for algorithm, bits, count in ARGS.STOCK]
+        serve_pool(spool=ARGS.SPOOL or default_spool(), stock=stock, low_water=ARGS.LOW_WATER, jobs=ARGS.JOBS, interval=ARGS.INTERVAL, once=ARGS.ONCE)
+    elif ARGS.SERVE:
+        from keysec.parsers.serve import serve_parser
+        from keysec.server import serve
+        try:
+            serve(ARGS.SOCKET)
+        except FileExistsError as error:
+            serve_parser.error(f'argument --socket/-s: {error}')
     else:
         top_parser.print_help()
 
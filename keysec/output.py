@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import atexit
+import os
+import secrets
+from pathlib import Path
+from typing import List, Tuple, Union
+
+from keysec import trace
+
+# Every file is written to a hidden temporary file next to its target, with 0600 permissions, flushed to disk and then renamed over the target, so
+# readers and crashes only ever see the old file or the complete new one. Runs writing many files have their worker processes write and flush the
+# staged files in parallel, and the main process rename them in groups (FileGroup), so each directory they land in is flushed once per group instead
+# of once per file.
+
+PathLike = Union[str, Path]
+
+
+def temp_path(path: Path) -> Path:
+    # Hidden, so pool and directory listings skip files that are still being written
+    return path.with_name(f'.{path.name}.{secrets.token_hex(8)}.tmp')
+
+
+def write_temp(path: PathLike, data: bytes) -> Path:
+    tmp = temp_path(Path(path))
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(fd, mode='wb') as out:
+        out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    return tmp
+
+
+def fsync_dir(path: PathLike):
+    # Makes renames inside the directory durable. Directories cannot be opened on Windows, where renames are already durable once done
+    if os.name != 'posix':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: PathLike, data: bytes):
+    path = Path(os.path.realpath(path))  # symlinks keep pointing to the file that gets replaced
+    with trace.span('write_atomic'):
+        tmp = write_temp(path, data)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            raise
+        fsync_dir(path.parent)
+
+
+class FileGroup:
+    """
+    Files staged with write_temp, already flushed to disk by whoever wrote them, renamed into place together every size files and when the group is
+    left. Each directory is flushed once after all the renames. Leaving the group through an exception deletes whatever was not renamed yet.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.pending: List[Tuple[Path, Path]] = []
+
+    def __enter__(self) -> 'FileGroup':
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.commit() if exc_type is None else self.discard()
+
+    def add(self, tmp: Path, path: PathLike):
+        self.pending.append((tmp, Path(os.path.realpath(path))))
+        if len(self.pending) >= self.size:
+            self.commit()
+
+    def commit(self):
+        if not self.pending:
+            return
+        with trace.span('commit_files', files=len(self.pending)):
+            for tmp, path in self.pending:
+                os.replace(tmp, path)
+            for directory in {path.parent for _, path in self.pending}:
+                fsync_dir(directory)
+            self.pending.clear()
+
+    def discard(self):
+        for tmp, _ in self.pending:
+            tmp.unlink(missing_ok=True)
+        self.pending.clear()
+
+
+class OutputFile:
+    """
+    --out file of a command. Nothing touches the target until close, which atomically replaces it with everything written so far, so a failure
+    leaves the previous file intact and a key can be edited in place (edit -i key -o key). Output left unclosed at exit is discarded.
+    """
+
+    def __init__(self, path: str):
+        self.name = path
+        self.closed = False
+        self._file = None
+        self._tmp = None
+
+    def _open(self):
+        self._tmp = temp_path(Path(os.path.realpath(self.name)))
+        self._file = open(os.open(self._tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), mode='wb')
+        atexit.register(self.discard)
+
+    def write(self, data: bytes) -> int:
+        if self._file is None:
+            self._open()
+        return self._file.write(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        if self._file is None:
+            self._open()
+        with trace.span('write_atomic'):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._tmp, os.path.realpath(self.name))
+            fsync_dir(self._tmp.parent)
+        self.closed = True
+
+    def discard(self):
+        if self._file is not None and not self.closed:
+            self._file.close()
+            self._tmp.unlink(missing_ok=True)
+            self.closed = True
@@ -2,12 +2,21 @@
 # encoding:utf-8
 
 
-from keysec.parsers import top, gen, conv, edit, info
 from keysec.parsers.args import ARGS, parse_args
-from keysec.parsers.conv import in_arg
-from keysec.parsers.gen import generate_parser
 from keysec.parsers.top import subparsers, top_parser
-from keysec.parsers.utils import sort_argparse_help
+from keysec.parsers.utils import in_arg, sort_argparse_help
+
+# Subcommand parsers are built on demand, so --help, --version and argument errors stay cheap
+subparsers.add_lazy_parser('gen', module='keysec.parsers.gen', help='generate a brand new key pair')
+subparsers.add_lazy_parser('conv', module='keysec.parsers.conv', help='transform a key from one format to another (openssl ↔ openssh)')
+subparsers.add_lazy_parser('edit', module='keysec.parsers.edit', help='edit the passphrase and comment of a key')
+subparsers.add_lazy_parser('info', module='keysec.parsers.info', help='show information about a key')
+subparsers.add_lazy_parser('sign', module='keysec.parsers.sign', help='issue OpenSSH user and host certificates for many public keys at once')
+subparsers.add_lazy_parser('audit', module='keysec.parsers.audit', help='report weak, unprotected and duplicated keys found under some folders')
+subparsers.add_lazy_parser('index', module='keysec.parsers.index', help='record the fingerprint of every key found under some folders, for keysec find')
+subparsers.add_lazy_parser('find', module='keysec.parsers.find', help='list the files holding a key, from the index built by keysec index')
+subparsers.add_lazy_parser('pool', module='keysec.parsers.pool', help='keep a stock of pre-generated private keys that gen priv --from-pool can take instantly')
+subparsers.add_lazy_parser('serve', module='keysec.parsers.serve', help='keep keysec loaded and serve gen, conv, edit and info requests over a UNIX socket')
 
 sort_argparse_help(subparsers)
 sort_argparse_help(top_parser)
@@ -2,40 +2,143 @@
 # encoding:utf-8
 
 
+import os
+import sys
+
 from keysec.parsers.top import top_parser
 
 
 class ARGS:
     ALGORITHM = None
+    AUDIT = None
+    BATCH = None
     BITS = None
+    CA = None
+    COMMAND = None
     COMMENT = None
+    CONNECT = None
+    COUNT = None
     CONVERT = None
+    DB = None
     EDIT = None
+    ENCODING = None
+    FIND = None
+    FINGERPRINT = None
     FORMAT = None
+    FROM_POOL = None
     GENERATE = None
+    HOST = None
+    IDENTITY = None
     IN = None
+    INDEX = None
     INFO = None
+    INPUTS = None
+    INTERVAL = None
+    JOBS = None
+    JSON = None
+    KDF = None
+    KDF_ROUNDS = None
+    LIST = None
+    LOW_WATER = None
+    MULTI = None
+    NAME = None
+    NOCOMMENT = None
     NOPASS = None
+    ONCE = None
+    OPTIONS = None
     OUT = None
+    OUTDIR = None
+    PASSIN = None
+    PASSOUT = None
     PASSWORD = None
+    PATHS = None
+    PRINCIPALS = None
+    POOL = None
     PRIVATE = None
     PUBLIC = None
+    PUBLIC_KEY = None
+    SERIAL = None
+    SERVE = None
+    SIGN = None
+    SOCKET = None
+    SPOOL = None
+    STOCK = None
+    TRACE = None
+    VALIDITY = None
+    WITH_PUBLIC = None
+
+
+def _read_input(infile) -> bytes:
+    if infile is None or infile == '-':
+        return sys.stdin.buffer.read()
+    if hasattr(infile, 'read'):
+        return infile.read()
+    try:
+        with open(infile, mode='rb') as file:
+            return file.read()
+    except OSError as error:
+        top_parser.error(f"argument --in/-i: can't open '{infile}': {error}")
 
 
 def parse_args():
     args = vars(top_parser.parse_args())
     ARGS.ALGORITHM = args.get('algorithm')
     ARGS.BITS = args.get('bits')
+    ARGS.CA = args.get('ca')
     ARGS.COMMENT = args.get('comment')
+    ARGS.CONNECT = args.get('connect')
+    ARGS.COUNT = args.get('count')
+    ARGS.DB = args.get('db')
+    ARGS.ENCODING = args.get('encoding')
+    ARGS.FINGERPRINT = args.get('fingerprint')
     ARGS.FORMAT = args.get('format')
-    ARGS.IN = args.get('infile').read() if args.get('infile') else None
+    ARGS.FROM_POOL = args.get('from_pool')
+    ARGS.HOST = args.get('host')
+    ARGS.IDENTITY = args.get('identity')
+    ARGS.INPUTS = args.get('infile') if isinstance(args.get('infile'), list) else []
+    ARGS.INPUTS += [path for path in sys.stdin.read().split('\0') if path] if args.get('from0') else []
+    ARGS.OUTDIR = args.get('outdir')
+    ARGS.JOBS = args.get('jobs')
+    ARGS.BATCH = bool(args.get('from0') or ARGS.OUTDIR or len(ARGS.INPUTS) > 1 or any(os.path.isdir(path) for path in ARGS.INPUTS))
+    ARGS.LIST = args.get('list')
+    ARGS.MULTI = bool(args.get('multi') or ARGS.LIST or args.get('opt') == 'sign')  # sign streams its keys from stdin, one per line
+    if not ARGS.BATCH and not ARGS.MULTI and 'infile' in args:
+        ARGS.IN = _read_input(ARGS.INPUTS[0] if ARGS.INPUTS else args.get('infile'))
+    ARGS.INTERVAL = args.get('interval')
+    ARGS.JSON = args.get('json')
+    ARGS.KDF = args.get('kdf')
+    ARGS.KDF_ROUNDS = args.get('kdf_rounds')
+    ARGS.LOW_WATER = args.get('low_water')
+    ARGS.NAME = args.get('name')
+    ARGS.NOCOMMENT = args.get('nocomment')
     ARGS.NOPASS = args.get('nopass')
+    ARGS.ONCE = args.get('once')
+    ARGS.OPTIONS = args.get('options')
     ARGS.OUT = args.get('outfile')
+    ARGS.PASSIN = args.get('passin')
+    ARGS.PASSOUT = args.get('passout')
     ARGS.PASSWORD = args.get('pass')
+    ARGS.PATHS = args.get('paths')
+    ARGS.PRINCIPALS = args.get('principals')
+    ARGS.PUBLIC_KEY = args.get('public_key')
+    ARGS.SERIAL = args.get('serial')
+    ARGS.SOCKET = args.get('socket')
+    ARGS.SPOOL = args.get('spool')
+    ARGS.STOCK = args.get('stock')
+    ARGS.TRACE = args.get('trace')
+    ARGS.VALIDITY = args.get('validity')
+    ARGS.COMMAND = ' '.join(filter(None, (args.get('opt'), args.get('gen'))))
+    ARGS.AUDIT = args.get('opt') == 'audit'
     ARGS.CONVERT = args.get('opt') == 'conv'
     ARGS.EDIT = args.get('opt') == 'edit'
+    ARGS.FIND = args.get('opt') == 'find'
     ARGS.GENERATE = args.get('opt') == 'gen'
+    ARGS.INDEX = args.get('opt') == 'index'
     ARGS.INFO = args.get('opt') == 'info'
+    ARGS.POOL = args.get('opt') == 'pool'
+    ARGS.SERVE = args.get('opt') == 'serve'
+    ARGS.SIGN = args.get('opt') == 'sign'
     ARGS.PRIVATE = args.get('gen') == 'priv'
     ARGS.PUBLIC = args.get('gen') == 'pub'
+    ARGS.WITH_PUBLIC = args.get('pub')
     return args
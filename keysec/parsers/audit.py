@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import sys
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import CustomArgumentFormatter, output_file, positive_int, sort_argparse_help
+
+audit_parser = subparsers.add_parser('audit', formatter_class=CustomArgumentFormatter)
+audit_parser.add_argument('paths', metavar='path', nargs='+',
+                          help='key file or directory to audit. Directories are walked recursively')
+audit_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
+                          help='output the report to the specified file. If this argument is not specified then standard output is used')
+audit_parser.add_argument('--format', '-f', dest='format', type=str.lower, choices=['json', 'csv'], default='json',
+                          help='report layout. JSON holds the summary counts along with the keys, while with CSV they are printed to stderr')
+audit_parser.add_argument('--min-rsa-bits', metavar='N', dest='bits', type=positive_int, default=2048,
+                          help='RSA keys smaller than this are reported as weak')
+audit_parser.add_argument('--jobs', '-J', metavar='N', dest='jobs', type=int, default=None,
+                          help='number of worker processes reading the keys. If not specified, one per CPU is used')
+
+sort_argparse_help(audit_parser)
@@ -3,17 +3,22 @@
 
 
 import sys
-from argparse import FileType
 
 from keysec.parsers.top import subparsers
-from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+from keysec.parsers.utils import add_batch_arguments, add_encoding_argument, add_kdf_arguments, add_multi_argument, add_pass_arguments, CustomArgumentFormatter, output_file, sort_argparse_help
 
-convert_parser = subparsers.add_parser('conv', help='transform a key from one format to another (openssl ↔ openssh)', formatter_class=CustomArgumentFormatter)
-in_arg = convert_parser.add_argument('--in', '-i', metavar='key', dest='infile', nargs='?', default=sys.stdin, type=FileType('r', encoding='utf-8'),
-                                     help='path to an existing PEM encoded public or private key. If not specified, it will be read from stdin')
-convert_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout, type=FileType('w', encoding='utf-8'),
+convert_parser = subparsers.add_parser('conv', formatter_class=CustomArgumentFormatter)
+convert_parser.add_argument('--in', '-i', metavar='key', dest='infile', nargs='+', action='extend', default=None,
+                            help='path to an existing PEM encoded public or private key, or to a directory of keys. It can be given several times. '
+                                 'If not specified, it will be read from stdin')
+convert_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
                             help='output the key to the specified file. If this argument is not specified then standard output is used')
 convert_parser.add_argument('--nopass', '-np', dest='nopass', action='store_true', default=False,
                             help="if this option is specified and the input key has a passphrase, the output key will not. Otherwise, the same passphrase will be kept for the output key")
+add_batch_arguments(convert_parser)
+add_multi_argument(convert_parser)
+add_kdf_arguments(convert_parser)
+add_encoding_argument(convert_parser)
+add_pass_arguments(convert_parser)
 
 sort_argparse_help(convert_parser)
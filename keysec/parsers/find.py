@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+from argparse import FileType
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+
+find_parser = subparsers.add_parser('find', formatter_class=CustomArgumentFormatter)
+key_group = find_parser.add_mutually_exclusive_group(required=True)
+key_group.add_argument('--fingerprint', '-f', metavar='SHA256:...', dest='fingerprint', default=None,
+                       help='SHA256 fingerprint of the key to look for, as printed by ssh-keygen -l or keysec info --list')
+key_group.add_argument('--public-key', '-k', metavar='key', dest='public_key', type=FileType('rb'), default=None,
+                       help='look for every copy of this key (public or private, any format) in the index')
+find_parser.add_argument('--db', metavar='filename', dest='db', default=None,
+                         help='index database to search. If not specified, $XDG_CACHE_HOME/keysec/index.sqlite is used')
+find_parser.add_argument('--json', '-j', dest='json', action='store_true', default=False,
+                         help='print one JSON object per match, with the format, type, size and comment of the key, instead of path:line')
+
+sort_argparse_help(find_parser)
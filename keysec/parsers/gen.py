@@ -4,47 +4,59 @@
 
 import collections
 import sys
-from argparse import Action, FileType
-
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
-from cryptography.hazmat.primitives.serialization import PrivateFormat
+from argparse import FileType
 
 from keysec.parsers.top import subparsers
-from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
-
-
-class AlgorithmAction(Action):
-    def __call__(self, parser, namespace, values, option_string=None):
-        algo = RSAPrivateKey if values == 'rsa' else Ed25519PrivateKey
-        setattr(namespace, self.dest, algo)
-
-
-class FormatAction(Action):
-    def __call__(self, parser, namespace, values, option_string=None):
-        dst_format = PrivateFormat.OpenSSH if values == 'openssh' else PrivateFormat.PKCS8
-        setattr(namespace, self.dest, dst_format)
+from keysec.parsers.utils import add_encoding_argument, add_kdf_arguments, add_pass_arguments, CustomArgumentFormatter, output_file, positive_int, sort_argparse_help
 
 
-generate_parser = subparsers.add_parser('gen', help='generate a brand new key pair', formatter_class=CustomArgumentFormatter)
+generate_parser = subparsers.add_parser('gen', formatter_class=CustomArgumentFormatter)
 generate_subparser = generate_parser.add_subparsers(dest='gen')
 
 # Generate a private key
 private_parser = generate_subparser.add_parser('priv', help='generate a private key in the specified format', formatter_class=CustomArgumentFormatter)
-private_parser.add_argument('--algo', '-a', dest='algorithm', type=str.lower, choices=['rsa', 'ed25519'], default=Ed25519PrivateKey, action=AlgorithmAction,
+private_parser.add_argument('--algo', '-a', dest='algorithm', type=str.lower, choices=['rsa', 'ecdsa', 'ed25519'], default='ed25519',
                             help='which algorithm should use the generated key. If this argument is not specified, then Ed25519 is used')
-private_parser.add_argument('--bits', '-b', type=int, choices=[2048, 4096], default=2048,
-                            help='RSA key size if chosen. Ed25519 works exclusively with 256-bit keys')
-private_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout, type=FileType('w', encoding='utf-8'),
+private_parser.add_argument('--bits', '-b', type=int, choices=[256, 384, 521, *range(2048, 8193, 1024)], default=None, metavar='{256,384,521,2048..8192}',
+                            help='key size. RSA keys can be 2048 to 8192 bits long in steps of 1024 (2048 by default), ECDSA keys use the NIST P-256, P-384 or '
+                                 'P-521 curve (P-256 by default), and Ed25519 works exclusively with 256-bit keys')
+private_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
                             help='output the key to the specified file. If this argument is not specified then standard output is used')
-private_parser.add_argument('--format', '-f', choices=['openssl', 'openssh'], default=PrivateFormat.PKCS8, action=FormatAction,
+private_parser.add_argument('--format', '-f', choices=['openssl', 'openssh'], default='openssl',
                             help='format of the generated key. If this argument is not specified then OpenSSL is used')
+private_parser.add_argument('--count', '-n', metavar='N', dest='count', type=positive_int, default=None,
+                            help='generate N keys at once using a pool of worker processes. Requires --outdir, where a manifest.json file listing every '
+                                 'generated key is written as well')
+private_parser.add_argument('--outdir', '-d', metavar='directory', dest='outdir', default=None,
+                            help='directory where the keys are written when --count is used')
+private_parser.add_argument('--name', metavar='template', dest='name', default='{algo}-{n}',
+                            help='file name template of the keys generated with --count. {n} is replaced by the key number and {algo} by its algorithm')
+private_parser.add_argument('--pub', '-P', dest='pub', action='store_true', default=False,
+                            help='when --count is used, also write every matching public key, with the same name plus a .pub suffix')
+private_parser.add_argument('--jobs', '-J', metavar='N', dest='jobs', type=int, default=None,
+                            help='number of worker processes used with --count. If not specified, one per CPU is used')
+private_parser.add_argument('--from-pool', dest='from_pool', action='store_true', default=False,
+                            help='take a pre-generated key from the pool kept by keysec pool, falling back to generating it if the pool is empty. It cannot be used '
+                                 'with --count')
+private_parser.add_argument('--spool', metavar='directory', dest='spool', default=None,
+                            help='pool directory used with --from-pool. If not specified, $XDG_DATA_HOME/keysec/pool is used')
+private_parser.add_argument('--pass', '-p', action='store_true', default=False,
+                            help='interactively set a passphrase for the generated key. With --count, it is asked once for all the keys')
+add_kdf_arguments(private_parser)
+add_encoding_argument(private_parser)
+add_pass_arguments(private_parser, passin=False)
 
 # Generate a public key
 public_parser = generate_subparser.add_parser('pub', help='given a private key, generate its associated public key with the same format', formatter_class=CustomArgumentFormatter)
-public_parser.add_argument('--in', '-i', metavar='private-key', dest='infile', nargs='?', default=sys.stdin, type=FileType('r', encoding='utf-8'),
-                           help='path to an existing PEM encoded private key. If not specified, it will be read from stdin')
-public_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout, type=FileType('w', encoding='utf-8'),
+public_parser.add_argument('--in', '-i', metavar='private-key', dest='infile', nargs='?', default=sys.stdin.buffer, type=FileType('rb'),
+                           help='path to an existing private key. Its passphrase is asked if it is encrypted, also for OpenSSH keys, whose comment is '
+                                'encrypted too, unless --nocomment is given. If not specified, it will be read from stdin')
+public_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
                            help='output the key to the specified file. If this argument is not specified then standard output is used')
+public_parser.add_argument('--nocomment', '-nc', dest='nocomment', action='store_true', default=False,
+                           help='leave the comment out of the public key. The comment of encrypted OpenSSH keys is encrypted too, so with this option '
+                                'their public key is read without asking for the passphrase')
+add_pass_arguments(public_parser, passout=False)
+add_encoding_argument(public_parser)
 
 collections.deque((sort_argparse_help(p) for p in (generate_parser, generate_subparser, private_parser, public_parser)), maxlen=0)
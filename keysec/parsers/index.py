@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+
+index_parser = subparsers.add_parser('index', formatter_class=CustomArgumentFormatter)
+index_parser.add_argument('paths', metavar='path', nargs='+',
+                          help='key file or directory to index. Files whose size and modification time did not change since the last run are not read again')
+index_parser.add_argument('--db', metavar='filename', dest='db', default=None,
+                          help='index database to update. If not specified, $XDG_CACHE_HOME/keysec/index.sqlite is used')
+index_parser.add_argument('--json', '-j', dest='json', action='store_true', default=False,
+                          help='print the number of parsed, unchanged and removed files as a JSON object')
+
+sort_argparse_help(index_parser)
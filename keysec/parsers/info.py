@@ -3,15 +3,22 @@
 
 
 import sys
-from argparse import FileType
 
 from keysec.parsers.top import subparsers
-from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+from keysec.parsers.utils import add_batch_arguments, add_multi_argument, add_pass_arguments, CustomArgumentFormatter, output_file, sort_argparse_help
 
-info_parser = subparsers.add_parser('info', help='show information about a key', formatter_class=CustomArgumentFormatter)
-info_parser.add_argument('--in', '-i', metavar='key', dest='infile', nargs='?', default=sys.stdin, type=FileType('r', encoding='utf-8'),
-                         help='path to an existing PEM encoded public or private key. If not specified, it will be read from stdin')
-info_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout, type=FileType('w', encoding='utf-8'),
+info_parser = subparsers.add_parser('info', formatter_class=CustomArgumentFormatter)
+info_parser.add_argument('--in', '-i', metavar='key', dest='infile', nargs='+', action='extend', default=None,
+                         help='path to an existing PEM encoded public or private key, or to a directory of keys. It can be given several times. '
+                              'If not specified, it will be read from stdin')
+info_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
                          help='output the information to the specified file. If this argument is not specified then standard output is used')
+info_parser.add_argument('--json', '-j', dest='json', action='store_true', default=False,
+                         help='output the information as a JSON object instead of the OpenSSL-like text layout')
+info_parser.add_argument('--list', '-l', dest='list', action='store_true', default=False,
+                         help='only print the size, SHA256 fingerprint, comment and type of every key in the input, like ssh-keygen -l')
+add_batch_arguments(info_parser)
+add_multi_argument(info_parser)
+add_pass_arguments(info_parser, passout=False)
 
 sort_argparse_help(info_parser)
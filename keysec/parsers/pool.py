@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+from argparse import ArgumentTypeError
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+
+
+_sizes = {
+    'rsa': tuple(range(2048, 8193, 1024)),
+    'ecdsa': (256, 384, 521),
+    'ed25519': (256,),
+}
+
+
+def stock_spec(value: str) -> tuple:
+    try:
+        kind, count = value.lower().split('=')
+        algorithm, _, bits = kind.partition(':')
+        bits, count = int(bits) if bits else None, int(count)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid stock '{value}', expected ALGO[:BITS]=COUNT") from None
+    if algorithm not in _sizes or (bits is not None and bits not in _sizes[algorithm]) or count < 1:
+        raise ArgumentTypeError(f"invalid stock '{value}', expected rsa[:2048..8192]=COUNT, ecdsa[:256|384|521]=COUNT or ed25519=COUNT")
+    return algorithm, bits or _sizes[algorithm][0], count
+
+
+pool_parser = subparsers.add_parser('pool', formatter_class=CustomArgumentFormatter)
+pool_parser.add_argument('--stock', '-s', metavar='ALGO[:BITS]=COUNT', dest='stock', type=stock_spec, action='append', required=True,
+                         help='number of keys of the given algorithm and size to keep ready, e.g. rsa:4096=50, ecdsa:384=20 or ed25519=100. It can be given several times')
+pool_parser.add_argument('--spool', metavar='directory', dest='spool', default=None,
+                         help='directory where the pre-generated keys are kept. If not specified, $XDG_DATA_HOME/keysec/pool is used')
+pool_parser.add_argument('--low-water', '-l', metavar='percent', dest='low_water', type=int, default=50,
+                         help='refill a stock when fewer keys than this percentage of it are left')
+pool_parser.add_argument('--interval', metavar='seconds', dest='interval', type=float, default=1.0,
+                         help='how often the stock is checked')
+pool_parser.add_argument('--jobs', '-J', metavar='N', dest='jobs', type=int, default=None,
+                         help='number of worker processes generating keys. If not specified, one per CPU is used')
+pool_parser.add_argument('--once', dest='once', action='store_true', default=False,
+                         help='fill every stock up to its size and exit instead of running as a daemon')
+
+sort_argparse_help(pool_parser)
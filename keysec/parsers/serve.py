@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import CustomArgumentFormatter, sort_argparse_help
+
+serve_parser = subparsers.add_parser('serve', formatter_class=CustomArgumentFormatter)
+serve_parser.add_argument('--socket', '-s', metavar='path', dest='socket', required=True,
+                          help='path of the UNIX socket to listen on. Clients reach it with keysec --connect path')
+
+sort_argparse_help(serve_parser)
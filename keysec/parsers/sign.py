@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import sys
+from argparse import ArgumentTypeError, FileType
+from typing import List
+
+from keysec.parsers.top import subparsers
+from keysec.parsers.utils import add_batch_arguments, add_pass_arguments, CustomArgumentFormatter, output_file, sort_argparse_help
+
+
+def serial(value: str) -> int:
+    if not value.isdigit() or int(value) >= 2 ** 64:
+        raise ArgumentTypeError(f'{value!r} is not a valid serial number')
+    return int(value)
+
+
+def principals(value: str) -> List[str]:
+    return [principal for principal in value.split(',') if principal]
+
+
+sign_parser = subparsers.add_parser('sign', formatter_class=CustomArgumentFormatter)
+sign_parser.add_argument('--ca', '-s', metavar='key', dest='ca', type=FileType('rb'), required=True,
+                         help='private key of the certificate authority, in any format keysec reads. It is loaded and decrypted only once')
+sign_parser.add_argument('--in', '-i', metavar='key', dest='infile', nargs='+', action='extend', default=None,
+                         help='public key to sign, or directory whose *.pub keys are signed. It can be given several times. Each key.pub gets a '
+                              'key-cert.pub certificate next to it, or inside --outdir, and the JSON manifest of the certificates is written to the '
+                              'output. If not specified, public keys are read one per line from stdin and their certificates written to the output')
+sign_parser.add_argument('--out', '-o', metavar='filename', dest='outfile', nargs='?', default=sys.stdout.buffer, type=output_file,
+                         help='output the manifest, or the certificates of keys read from stdin, to the specified file. If this argument is not '
+                              'specified then standard output is used')
+sign_parser.add_argument('--identity', '-I', metavar='key_id', dest='identity', default='{name}',
+                         help='key identity of the certificates, logged by sshd. {name} is replaced by the name of the key file (without .pub) or '
+                              'the key comment when read from stdin, {comment} by the key comment and {serial} by the serial number')
+sign_parser.add_argument('--principals', '-n', metavar='names', dest='principals', type=principals, action='extend', default=[],
+                         help='comma separated user or host names the certificates are valid for, which accept the same replacements as '
+                              '--identity. If not specified, they are valid for any principal')
+sign_parser.add_argument('--host', '-H', dest='host', action='store_true', default=False,
+                         help='issue host certificates instead of user certificates')
+sign_parser.add_argument('--validity', '-V', metavar='interval', dest='validity', default=None,
+                         help='validity interval as in ssh-keygen: from:to, or only to, starting now. Times are relative like +52w or -5m, '
+                              'YYYYMMDD[HHMM[SS]][Z], always or forever. If not specified, always:forever is used')
+sign_parser.add_argument('--serial', '-z', metavar='N', dest='serial', type=serial, default=0,
+                         help='serial number of the first certificate. Every following key gets the next one, in input order')
+sign_parser.add_argument('--option', '-O', metavar='option', dest='options', action='append', default=[],
+                         help='certificate option as in ssh-keygen: clear, no-pty and the other no-*/permit-* extensions, force-command=command, '
+                              'source-address=list, verify-required, critical:name[=value] or extension:name[=value]. It can be given several times')
+add_batch_arguments(sign_parser)
+add_pass_arguments(sign_parser, passout=False)
+
+sort_argparse_help(sign_parser)
@@ -4,12 +4,19 @@
 
 from argparse import ArgumentParser
 
-from keysec.parsers.utils import CustomArgumentFormatter
+from keysec.parsers.utils import CustomArgumentFormatter, LazySubParsersAction, trace_fd
 from keysec.version import version_msg
 
-top_parser = ArgumentParser(prog='keysec', description='With this program you will be able to generate OpenSSL and OpenSSH keys (RSA, Ed25519) and carry out '
+top_parser = ArgumentParser(prog='keysec', description='With this program you will be able to generate OpenSSL and OpenSSH keys (RSA, ECDSA, Ed25519) and carry out '
                                                        'transformations between both formats.', formatter_class=CustomArgumentFormatter)
 
 top_parser.add_argument('--version', '-v', help='print version information and exit', action='version', version=version_msg)
+top_parser.add_argument('--connect', metavar='socket', dest='connect', default=None,
+                        help='send the command to a keysec serve daemon listening on this UNIX socket instead of running it in this process')
+top_parser.add_argument('--trace', dest='trace', action='store_const', const='stderr', default=None,
+                        help='write the wall and CPU time of every stage of the run to stderr, as one JSON line per stage. Setting the KEYSEC_TRACE '
+                             'environment variable to 1 or fd:N does the same')
+top_parser.add_argument('--trace-fd', metavar='N', dest='trace', type=trace_fd,
+                        help='like --trace, but write to the already open file descriptor N')
 
-subparsers = top_parser.add_subparsers(dest='opt')
+subparsers = top_parser.add_subparsers(dest='opt', action=LazySubParsersAction)
@@ -2,10 +2,16 @@
 # encoding:utf-8
 
 
+import importlib
+import os
+import sys
 import textwrap
-from argparse import ArgumentParser, RawTextHelpFormatter, _SubParsersAction
+from argparse import Action, ArgumentParser, ArgumentTypeError, RawTextHelpFormatter, _SubParsersAction
 from typing import Union
 
+# Stand-in for the --in argument, so errors about the input key can be reported without building any subparser
+in_arg = Action(option_strings=['--in', '-i'], dest='infile')
+
 
 class CustomArgumentFormatter(RawTextHelpFormatter):
     # https://stackoverflow.com/a/65891304
@@ -29,9 +35,116 @@ class CustomArgumentFormatter(RawTextHelpFormatter):
         return new_text
 
 
+class LazySubParsersAction(_SubParsersAction):
+    """Subparsers whose parsers are only built, by importing the module that defines them, once their command is actually used."""
+
+    class _ParserMap(dict):
+        def __init__(self):
+            super().__init__()
+            self.modules = {}
+
+        def __missing__(self, name):
+            importlib.import_module(self.modules[name])
+            if self.get(name) is None:
+                raise KeyError(name)
+            return self.get(name)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._name_parser_map = self._ParserMap()
+        self.choices = []
+
+    def add_lazy_parser(self, name: str, module: str, help: str):
+        self._name_parser_map.modules[name] = module
+        self._choices_actions.append(self._ChoicesPseudoAction(name, (), help))
+        self.choices.append(name)
+
+    def add_parser(self, name, **kwargs):
+        self.choices.append(name) if name not in self.choices else None
+        return super().add_parser(name, **kwargs)
+
+
 def sort_argparse_help(parser: Union[ArgumentParser, _SubParsersAction]):
     if isinstance(parser, _SubParsersAction):
         parser._choices_actions.sort(key=lambda x: x.dest)
     else:
         for g in parser._action_groups:
             g._group_actions.sort(key=lambda x: x.dest)
+
+
+def add_batch_arguments(parser: ArgumentParser):
+    parser.add_argument('--from0', '-0', dest='from0', action='store_true', default=False,
+                        help='read a NUL-separated list of input paths from stdin, like the one produced by find -print0')
+    parser.add_argument('--outdir', '-d', metavar='directory', dest='outdir', default=None,
+                        help='when processing several keys, write each result to a file with the same name inside this directory instead of '
+                             'sending all of them to the output stream')
+    parser.add_argument('--jobs', '-J', metavar='N', dest='jobs', type=int, default=None,
+                        help='number of worker processes used when processing several keys. If not specified, one per CPU is used')
+
+
+def add_multi_argument(parser: ArgumentParser):
+    parser.add_argument('--multi', '-m', dest='multi', action='store_true', default=False,
+                        help='the input holds any number of keys, like an authorized_keys file or a PEM bundle. They are read and written one at a time, '
+                             'keeping the options of authorized_keys lines')
+
+
+def positive_int(value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ArgumentTypeError(f'{value!r} is not a positive integer')
+    return int(value)
+
+
+def trace_fd(value: str) -> str:
+    if not value.isdigit():
+        raise ArgumentTypeError(f'{value!r} is not a file descriptor number')
+    try:
+        os.fstat(int(value))
+    except OSError:
+        raise ArgumentTypeError(f'file descriptor {value} is not open') from None
+    return f'fd:{value}'
+
+
+def output_file(value: str):
+    # Like FileType('wb'), except that the file is only replaced once the whole output has been written
+    if value == '-':
+        return sys.stdout.buffer
+    from keysec.output import OutputFile
+    if os.path.isdir(value):
+        raise ArgumentTypeError(f"can't open '{value}': is a directory")
+    if not os.access(os.path.dirname(os.path.realpath(value)), os.W_OK):
+        raise ArgumentTypeError(f"can't open '{value}': its directory does not exist or is not writable")
+    return OutputFile(value)
+
+
+def pass_source(value: str) -> str:
+    kind, sep, rest = value.partition(':')
+    if not sep or kind not in ('pass', 'env', 'file', 'fd') or (kind == 'fd' and not rest.isdigit()):
+        raise ArgumentTypeError(f'{value!r} is not a passphrase source, expected pass:TEXT, env:VAR, file:PATH or fd:N')
+    return value
+
+
+def add_pass_arguments(parser: ArgumentParser, passin: bool = True, passout: bool = True):
+    if passin:
+        parser.add_argument('--passin', metavar='source', dest='passin', type=pass_source, default=None,
+                            help='read the passphrase of encrypted input keys from pass:TEXT, env:VAR, file:PATH or fd:N (first line) instead of asking for '
+                                 'it. It is read once and used for every key, which also allows processing several encrypted keys at once')
+    if passout:
+        parser.add_argument('--passout', metavar='source', dest='passout', type=pass_source, default=None,
+                            help='read the passphrase of the output key from pass:TEXT, env:VAR, file:PATH or fd:N (first line) instead of asking for it. '
+                                 'An empty passphrase leaves the key unencrypted')
+
+
+def add_encoding_argument(parser: ArgumentParser, keep: bool = False):
+    default = 'the encoding of the input key' if keep else 'pem'
+    parser.add_argument('--encoding', '-e', dest='encoding', type=str.lower, choices=['pem', 'der', 'raw'], default=None,
+                        help='encoding of the output key: pem (text, also for OpenSSH keys), der (binary, only for the OpenSSL format) or raw (Ed25519 '
+                             'only: the 32 byte public key, or the unencrypted 32 byte private seed followed by the public key). DER and raw input '
+                             f'keys are recognized automatically. If not specified, {default} is used')
+
+
+def add_kdf_arguments(parser: ArgumentParser):
+    parser.add_argument('--kdf-rounds', '-R', metavar='N', dest='kdf_rounds', type=positive_int, default=None,
+                        help='cost of the passphrase key derivation of the output key: bcrypt rounds for OpenSSH keys (16 by default), PBKDF2 iterations '
+                             '(2048 by default) or scrypt cost, a power of 2 up to 16384, for OpenSSL keys. Edited keys keep their cost if not specified')
+    parser.add_argument('--kdf', metavar='kdf', dest='kdf', type=str.lower, choices=['pbkdf2', 'scrypt'], default=None,
+                        help='passphrase key derivation function of OpenSSL keys, pbkdf2 or scrypt. OpenSSH keys always use bcrypt')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat
+
+from keysec.actions.gen import Algorithm, algorithm_name, gen_private, key_bits
+from keysec.iokeys import Key, make_private_dir
+from keysec.output import write_atomic
+
+Stock = Tuple[Algorithm, int, int]
+
+
+def default_spool() -> Path:
+    return Path(os.environ.get('XDG_DATA_HOME') or Path.home().joinpath('.local', 'share')).joinpath('keysec', 'pool')
+
+
+def pool_dir(spool: Path, algorithm: Algorithm, bits: int) -> Path:
+    return Path(spool).joinpath(f'{algorithm_name(algorithm)}-{key_bits(algorithm, bits)}')
+
+
+def ready_keys(directory: Path) -> List[str]:
+    # Keys being written or taken are hidden behind a leading dot
+    try:
+        return [name for name in os.listdir(directory) if not name.startswith('.')]
+    except FileNotFoundError:
+        return []
+
+
+def put_key(directory: Path, algorithm: Algorithm, bits: int):
+    key_data = gen_private(algorithm=algorithm, dst_format=PrivateFormat.PKCS8, bits=bits)
+    make_private_dir(directory)
+    write_atomic(directory.joinpath(secrets.token_hex(16)), key_data + b'\n')
+
+
+def take_key(directory: Path) -> Optional[bytes]:
+    # Renaming is atomic, so only one process can claim a given key
+    for name in ready_keys(directory):
+        claimed = directory.joinpath(f'.taken-{os.getpid()}-{name}')
+        try:
+            os.rename(directory.joinpath(name), claimed)
+        except FileNotFoundError:
+            continue
+        try:
+            return claimed.read_bytes()
+        finally:
+            claimed.unlink()
+    return None
+
+
+def _alive(pid: int) -> bool:
+    if os.name != 'posix':  # no cheap way to tell, claims are only swept where there is
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep_claims(directory: Path) -> int:
+    # Keys claimed by take_key in processes that died before deleting them. They are deleted rather than put back, since they may have been handed
+    # out already
+    swept = 0
+    for name in os.listdir(directory) if directory.is_dir() else ():
+        pid = name.split('-')[1] if name.startswith('.taken-') and name.count('-') >= 2 else ''
+        if pid.isdigit() and not _alive(int(pid)):
+            directory.joinpath(name).unlink(missing_ok=True)
+            swept += 1
+    return swept
+
+
+def gen_pooled(spool: Path, algorithm: Algorithm, dst_format: PrivateFormat, bits: int = None, password: str = '', kdf: str = None, rounds: int = None,
+               encoding: Encoding = None) -> bytes:
+    key_data = take_key(pool_dir(spool, algorithm, bits))
+    if key_data is None:
+        return gen_private(algorithm=algorithm, dst_format=dst_format, bits=bits, password=password, kdf=kdf, rounds=rounds, encoding=encoding)
+    key = Key()
+    key.load_key(key_data=key_data)
+    return key.to_bytes(str_format=dst_format, password=password, kdf=kdf, rounds=rounds, encoding=encoding)
+
+
+def _report(directory: Path, future: Future):
+    # A key that failed to be generated or written is only logged, the next round makes up for it
+    error = future.exception()
+    if error is not None:
+        print(f'keysec: {directory}: {str(error) or type(error).__name__}', file=sys.stderr)
+
+
+def serve_pool(spool: Path, stock: List[Stock], low_water: int = 50, jobs: int = None, interval: float = 1.0, once: bool = False):
+    pending: Dict[Path, Set[Future]] = {pool_dir(spool, algorithm, bits): set() for algorithm, bits, _ in stock}
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        while True:
+            for algorithm, bits, target in stock:
+                directory = pool_dir(spool, algorithm, bits)
+                sweep_claims(directory)
+                for future in [future for future in pending[directory] if future.done()]:
+                    pending[directory].discard(future)
+                    _report(directory, future)
+                available = len(ready_keys(directory)) + len(pending[directory])
+                if once or available < target * low_water / 100:
+                    pending[directory].update(pool.submit(put_key, directory, algorithm, bits) for _ in range(target - available))
+            if once:
+                for directory, futures in pending.items():
+                    for future in wait(futures).done:
+                        _report(directory, future)
+                return
+            time.sleep(interval)
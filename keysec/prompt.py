@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import contextlib
+import io
+import os
+import sys
+from getpass import getpass, _raw_input
+from typing import Callable, Dict
+
+_sources: Dict[str, Callable[..., str]] = {}
+
+
+def safe_print(text=''):
+    with contextlib.ExitStack() as stack:
+        try:
+            fd = os.open('/dev/tty', os.O_RDWR | os.O_NOCTTY)
+            tty = io.FileIO(fd, 'w+')
+            stack.enter_context(tty)
+            sf_input = io.TextIOWrapper(tty)
+            stack.enter_context(sf_input)
+            stream = sf_input
+        except OSError:
+            stack.close()
+            stream = sys.stderr
+        try:
+            stream.write(text + '\n')
+        except UnicodeEncodeError:
+            prompt = text.encode(stream.encoding, 'replace')
+            prompt = prompt.decode(stream.encoding)
+            stream.write(prompt + '\n')
+        stream.flush()
+
+
+def safe_input(prompt='') -> str:
+    with contextlib.ExitStack() as stack:
+        try:
+            fd = os.open('/dev/tty', os.O_RDWR | os.O_NOCTTY)
+            tty = io.FileIO(fd, 'w+')
+            stack.enter_context(tty)
+            sf_input = io.TextIOWrapper(tty)
+            stack.enter_context(sf_input)
+            stream = sf_input
+        except OSError:
+            stack.close()
+            stream, sf_input = sys.stderr, sys.stdin
+        res = _raw_input(prompt=prompt, stream=stream, input=sf_input)
+        stream.flush()
+        return res
+
+
+def _first_line(fd: int) -> bytes:
+    # One byte at a time, so nothing after the first line is taken from a shared descriptor
+    line = b''
+    while not line.endswith(b'\n'):
+        chunk = os.read(fd, 1)
+        if not chunk:
+            break
+        line += chunk
+    return line
+
+
+def read_passphrase(source: str) -> str:
+    """Reads a passphrase from an openssl style source: pass:TEXT, env:VAR, file:PATH or fd:N. Only the first line of files and descriptors is used."""
+    kind, _, value = source.partition(':')
+    if kind == 'pass':
+        return value
+    if kind == 'env':
+        if value not in os.environ:
+            raise ValueError(f'environment variable {value} is not set')
+        return os.environ[value]
+    if kind == 'file':
+        with open(value, mode='rb') as file:
+            line = file.readline()
+    elif kind == 'fd':
+        line = _first_line(int(value))
+    else:
+        raise ValueError(f'invalid passphrase source: {source}')
+    return line.rstrip(b'\r\n').decode('utf-8')
+
+
+def passphrase_source(source: str) -> Callable[..., str]:
+    # Prompt replacement reading the source the first time it is called. Every later call, for any number of keys, gets the same passphrase
+    if source not in _sources:
+        value = None
+
+        def prompt(_: str = '') -> str:
+            nonlocal value
+            if value is None:
+                value = read_passphrase(source)
+            return value
+
+        _sources[source] = prompt
+    return _sources[source]
+
+
+def ask_new_password() -> str:
+    password = getpass('Enter new passphrase (empty for no passphrase): ')
+    password_rep = getpass('Enter same passphrase again: ')
+    if password != password_rep:
+        raise ValueError('Passphrases do not match.')
+    return password
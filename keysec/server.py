@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import signal
+import stat
+import sys
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+
+from keysec import api
+from keysec.client import recv_message, send_message
+
+
+class PasswordRequired(Exception):
+    pass
+
+
+def handle_request(message: dict) -> str:
+    def passphrase() -> str:
+        if message.get('password') is None:
+            raise PasswordRequired
+        return message['password']
+
+    op, kdf = message.get('op'), {'kdf': message.get('kdf'), 'rounds': message.get('kdf_rounds')}
+    if op == 'gen_private':
+        res = api.gen_private(algorithm=message.get('algorithm', 'ed25519'), fmt=message.get('format', 'openssl'), bits=message.get('bits'),
+                              new_passphrase=message.get('new_password') or '', **kdf)
+    elif op == 'gen_public':
+        res = api.gen_public(message['key'], passphrase=passphrase, comment=message.get('comment', True) is not False)
+    elif op == 'conv':
+        password = message.get('new_password')
+        res = api.convert(message['key'], passphrase=passphrase, nopass=bool(message.get('nopass')), new_passphrase=password if isinstance(password, str) else None, **kdf)
+    elif op == 'edit':
+        comment, password = message.get('comment'), message.get('new_password')
+        res = api.edit(message['key'], passphrase=passphrase, comment=comment if isinstance(comment, str) else None, new_passphrase=password if isinstance(password, str) else None, **kdf)
+    elif op == 'info':
+        res = api.info(message['key'], passphrase=passphrase, as_json=bool(message.get('json')))
+    else:
+        raise ValueError(f'unknown operation: {op}')
+    return res.decode('utf-8')
+
+
+class RequestHandler(StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.connection)
+            except (EOFError, ConnectionError):
+                return
+            try:
+                send_message(self.connection, {'ok': True, 'result': handle_request(message)})
+            except PasswordRequired:
+                send_message(self.connection, {'ok': False, 'password_required': True})
+            except Exception as error:
+                send_message(self.connection, {'ok': False, 'error': str(error) or type(error).__name__})
+
+
+class KeysecServer(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str):
+    # A socket left by a previous run is replaced, anything else at the path is kept
+    try:
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise FileExistsError(f'{path} already exists and is not a socket')
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with KeysecServer(path, RequestHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
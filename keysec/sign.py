@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from cryptography import __version__ as cryptography_version
+from cryptography.hazmat.primitives.serialization import (Encoding, NoEncryption, PrivateFormat, SSHCertificate, SSHCertificateBuilder, SSHCertificateType,
+                                                          load_der_private_key)
+
+from keysec import openssh
+from keysec.batch import duplicate_targets, expand_inputs
+from keysec.iokeys import Key, make_private_dir
+from keysec.output import FileGroup, write_temp
+from keysec.stream import Record
+
+# The CA key is loaded and decrypted once, then handed unencrypted to every worker process when it starts, so each certificate only costs parsing
+# a public key and one signature. Certificate files are staged by the workers and renamed into place by the main process, like batch outputs.
+
+CERT_TYPES = {'user': SSHCertificateType.USER, 'host': SSHCertificateType.HOST}
+# Extensions of user certificates unless cleared, the same as ssh-keygen
+DEFAULT_EXTENSIONS = ('permit-X11-forwarding', 'permit-agent-forwarding', 'permit-port-forwarding', 'permit-pty', 'permit-user-rc')
+ALWAYS, FOREVER = 0, 2 ** 64 - 1
+# OpenSSH expects non-empty option and extension values inside a string of their own, which cryptography only adds itself from version 41 on
+_WRAP_VALUES = int(cryptography_version.split('.')[0]) < 41
+
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_ca = None
+
+
+def parse_time(value: str, now: int) -> int:
+    # ssh-keygen times: relative ([+-] then seconds or amounts like 1w2d), absolute (YYYYMMDD[HHMM[SS]], local time unless followed by Z) or 0x seconds
+    if value.startswith(('+', '-')):
+        parts = re.fullmatch(r'((\d+)([smhdw]?))+', value[1:], re.IGNORECASE) and re.findall(r'(\d+)([smhdw]?)', value[1:], re.IGNORECASE)
+        if not parts:
+            raise ValueError(f'invalid relative time: {value}')
+        seconds = sum(int(amount) * _UNITS[unit.lower()] for amount, unit in parts)
+        return max(0, now + seconds if value[0] == '+' else now - seconds)
+    if value.lower().startswith('0x'):
+        return int(value, 16)
+    utc = value.endswith(('Z', 'z'))
+    digits = value.rstrip('Zz')
+    layouts = {8: '%Y%m%d', 12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}
+    if not digits.isdigit() or len(digits) not in layouts:
+        raise ValueError(f'invalid time: {value}')
+    moment = datetime.strptime(digits, layouts[len(digits)])
+    return int((moment.replace(tzinfo=timezone.utc) if utc else moment).timestamp())
+
+
+def parse_validity(value: str, now: int = None) -> Tuple[int, int]:
+    """Returns the valid_after and valid_before times of an ssh-keygen -V interval: from:to, or only to, valid from now on."""
+    now = int(time.time()) if now is None else now
+    start, sep, end = value.partition(':')
+    if not sep:
+        start, end = '+0', start
+    valid_after = ALWAYS if start.lower() == 'always' else parse_time(start, now)
+    valid_before = FOREVER if end.lower() == 'forever' else parse_time(end, now)
+    if valid_before <= valid_after:
+        raise ValueError(f'empty validity interval: {value}')
+    return valid_after, valid_before
+
+
+def parse_options(options: Iterable[str], cert_type: str = 'user') -> Tuple[dict, dict]:
+    """
+    Returns the critical options and extensions given by ssh-keygen -O style options: clear, no-* and permit-* for the default extensions,
+    force-command=, source-address=, verify-required, and critical:name[=value] or extension:name[=value] for any other.
+    """
+    critical, extensions = {}, dict.fromkeys(DEFAULT_EXTENSIONS if cert_type == 'user' else (), '')
+    for option in options:
+        name, _, value = option.partition('=')
+        if option == 'clear':
+            extensions.clear()
+        elif name in ('force-command', 'source-address') and value:
+            critical[name] = value
+        elif option == 'verify-required':
+            extensions[option] = ''
+        elif name.startswith('no-') and f'permit-{name[3:]}' in DEFAULT_EXTENSIONS:
+            extensions.pop(f'permit-{name[3:]}', None)
+        elif name in DEFAULT_EXTENSIONS and not value:
+            extensions[name] = ''
+        elif name.startswith(('critical:', 'extension:')) and name.partition(':')[2]:
+            kind, _, name = name.partition(':')
+            (critical if kind == 'critical' else extensions)[name] = value
+        else:
+            raise ValueError(f'unknown certificate option: {option}')
+    if critical and cert_type == 'host':
+        raise ValueError('host certificates do not take critical options')
+    return critical, extensions
+
+
+def _option_value(value: str) -> bytes:
+    return openssh.put_sshstr(value.encode('utf-8')) if value and _WRAP_VALUES else value.encode('utf-8')
+
+
+def certificate(ca, key: Key, serial: int, key_id: str, principals: List[str], cert_type: str, valid_after: int, valid_before: int, critical: dict,
+                extensions: dict) -> SSHCertificate:
+    builder = SSHCertificateBuilder().public_key(key.public_key()).serial(serial).type(CERT_TYPES[cert_type]).key_id(key_id.encode('utf-8'))
+    builder = builder.valid_principals([principal.encode('utf-8') for principal in principals]) if principals else builder.valid_for_all_principals()
+    builder = builder.valid_after(valid_after).valid_before(valid_before)
+    for name, value in sorted(critical.items()):
+        builder = builder.add_critical_option(name.encode('utf-8'), _option_value(value))
+    for name, value in sorted(extensions.items()):
+        builder = builder.add_extension(name.encode('utf-8'), _option_value(value))
+    return builder.sign(ca)
+
+
+def key_name(path: Path) -> str:
+    return path.name[:-4] if path.name.endswith('.pub') else path.name
+
+
+def cert_path(path: Path) -> Path:
+    # Same name as ssh-keygen: key.pub is signed into key-cert.pub
+    return path.with_name(f'{key_name(path)}-cert.pub')
+
+
+def sign_key(key: Key, name: str, serial: int, spec: dict) -> Tuple[bytes, dict]:
+    # Returns the certificate line, followed by the comment of the key, and its manifest record. spec holds the arguments of certificate
+    if isinstance(key.orig_format, PrivateFormat):
+        raise ValueError('this is a private key, sign its public key instead')
+    comment = key.get_ssh_comment() if key.is_ssh() else ''
+    fields = {'name': name, 'comment': comment, 'serial': serial}
+    key_id, principals = spec['identity'].format(**fields), [principal.format(**fields) for principal in spec['principals']]
+    cert = certificate(_ca, key, serial=serial, key_id=key_id, principals=principals, cert_type=spec['type'], valid_after=spec['valid_after'],
+                       valid_before=spec['valid_before'], critical=spec['critical'], extensions=spec['extensions'])
+    record = {'key_id': key_id, 'serial': serial, 'type': spec['type'], 'principals': principals, 'valid_after': spec['valid_after'],
+              'valid_before': spec['valid_before'], 'fingerprint': openssh.fingerprint(openssh.public_blob(key.public_key()))}
+    return b' '.join(filter(None, (cert.public_bytes(), comment.encode('utf-8')))), record
+
+
+def load_ca(ca_der: bytes):
+    global _ca
+    _ca = load_der_private_key(ca_der, password=None)
+
+
+def ca_bytes(ca: Key) -> bytes:
+    # What workers get: the CA key already decrypted, so the KDF of its passphrase only runs once
+    if not ca.is_private() or ca.public_only:
+        raise ValueError('the CA key must be a private key')
+    return ca.key.private_bytes(encoding=Encoding.DER, format=PrivateFormat.PKCS8, encryption_algorithm=NoEncryption())
+
+
+def expand_public_keys(paths: Iterable[str]) -> Iterator[Tuple[Path, Path]]:
+    # Directories only contribute their public keys, leaving out private keys and earlier certificates
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from ((file, relname) for file, relname in expand_inputs([path]) if file.name.endswith('.pub') and not file.name.endswith('-cert.pub'))
+        else:
+            yield path, Path(path.name)
+
+
+def _work(item: Tuple[int, Tuple[Path, Path]], spec: dict, outdir: Optional[Path]) -> Tuple[Path, Optional[dict], Optional[Tuple[Path, Path]], Optional[str]]:
+    serial, (path, relname) = item
+    try:
+        key = Key()
+        key.load_public(key_data=path.read_bytes())
+        line, record = sign_key(key, name=key_name(path), serial=serial, spec=spec)
+        target = outdir.joinpath(cert_path(relname)) if outdir else cert_path(path)
+        make_private_dir(target.parent)
+        return path, {'path': str(path), 'certificate': str(target), **record}, (write_temp(target, line + b'\n'), target), None
+    except Exception as error:
+        return path, None, None, str(error) or type(error).__name__
+
+
+def sign_files(paths: Iterable[str], ca_der: bytes, spec: dict, outdir: str = None, jobs: int = None, errors: list = None) -> List[dict]:
+    """
+    Signs every public key under paths with the CA key given by ca_bytes into a certificate file, next to the key or inside outdir, and returns
+    their manifest. Serials are given in order starting from spec['serial']. Keys that cannot be signed are appended to errors.
+    """
+    keys = list(expand_public_keys(paths))
+    clashes = duplicate_targets(keys) if outdir else set()
+    for path, relname in keys:
+        if relname in clashes and errors is not None:
+            errors.append((path, f'{cert_path(relname)} is also the certificate name of another key, give them different names'))
+    items = list(enumerate(((path, relname) for path, relname in keys if relname not in clashes), spec['serial']))
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(items)))
+    work = partial(_work, spec=spec, outdir=Path(outdir) if outdir else None)
+    manifest = []
+    if jobs == 1:
+        load_ca(ca_der)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=load_ca, initargs=(ca_der,)) if jobs > 1 else nullcontext() as pool, FileGroup() as group:
+        for path, record, staged, error in pool.map(work, items, chunksize=max(1, min(256, len(items) // (jobs * 4)))) if pool else map(work, items):
+            if error is not None:
+                errors.append((path, error)) if errors is not None else None
+                continue
+            group.add(*staged)
+            manifest.append(record)
+    return manifest
+
+
+def sign_record(record: Record, key: Key, spec: dict, serials: Iterator[int]) -> bytes:
+    # For streams of public keys (keysec.stream), signed in this process once the CA is loaded with load_ca. Keys are named after their comment
+    return sign_key(key, name=key.get_ssh_comment() if key.is_ssh() and key.get_ssh_comment() else f'line-{record.line}', serial=next(serials), spec=spec)[0]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import json
+import sys
+from argparse import ArgumentError
+from getpass import getpass
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Tuple
+
+from cryptography.hazmat.primitives.serialization import PublicFormat
+
+from keysec import openssh
+from keysec.actions.conv import convert
+from keysec.actions.info import fingerprint_line, info, report
+from keysec.iokeys import Key
+
+# Files holding many keys (authorized_keys files, PEM bundles) are read one line at a time and split into records, which are processed and
+# written out one after the other, so memory use does not depend on the size of the input.
+
+_KEY_TYPES = tuple(openssh.KEY_TYPES)
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+
+
+class Record(NamedTuple):
+    line: int  # number of the first line of the record
+    text: bytes  # the key, or the line itself for blank and comment lines
+    options: str = ''  # authorized_keys options prefix
+    passthrough: bool = False  # blank or comment line
+
+    def load(self, prompt: Callable[[str], str], public: bool = False) -> Key:
+        key = Key(prompt=prompt)
+        key.load_public(key_data=self.text) if public else key.load_key(key_data=self.text)
+        return key
+
+
+def split_options(line: bytes) -> Tuple[str, bytes]:
+    # authorized_keys lines may start with options, which end at the first space that is not inside double quotes
+    if line.startswith(_KEY_TYPES):
+        return '', line
+    quoted, escaped = False, False
+    for pos, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == _BACKSLASH:
+            escaped = True
+        elif char == _QUOTE:
+            quoted = not quoted
+        elif char in b' \t' and not quoted:
+            return line[:pos].decode('utf-8', 'replace'), line[pos:].strip()
+    return '', line
+
+
+def iter_records(lines: Iterable[bytes]) -> Iterator[Record]:
+    block, start = None, 0
+    for number, line in enumerate(lines, 1):
+        if block is not None:
+            block.append(line)
+            if line.startswith(b'-----END '):
+                yield Record(line=start, text=b''.join(block))
+                block = None
+        elif line.startswith(b'-----BEGIN '):
+            block, start = [line], number
+        elif not line.strip() or line.lstrip().startswith(b'#'):
+            yield Record(line=number, text=line.rstrip(b'\r\n'), passthrough=True)
+        else:
+            options, key = split_options(line.strip())
+            yield Record(line=number, text=key, options=options)
+    if block is not None:
+        yield Record(line=start, text=b''.join(block))  # truncated block, reported when loaded
+
+
+def convert_record(record: Record, key: Key, **kwargs) -> bytes:
+    # An OpenSSH public key turned into PEM keeps its options and comment as explanatory text above the block (RFC 7468)
+    res = convert(key, **kwargs)
+    if key.orig_format is PublicFormat.OpenSSH:
+        note = ' '.join(filter(None, (record.options, key.get_ssh_comment())))
+        res = f'# {note}\n'.encode('utf-8') + res if note else res
+    return res
+
+
+def info_record(record: Record, key: Key, as_json: bool = False) -> bytes:
+    if as_json:
+        return json.dumps({**report(key), 'line': record.line, 'options': record.options or None}).encode('utf-8')
+    options = f'Options: {record.options}\n' if record.options else ''
+    return f'==> line {record.line} <==\n{options}'.encode('utf-8') + info(key)
+
+
+def fingerprint_record(record: Record, key: Key) -> bytes:
+    return fingerprint_line(key).encode('utf-8')
+
+
+def process_stream(lines: Iterable[bytes], func: Callable[..., bytes], output: BinaryIO, source: str, passthrough: bool = False,
+                   prompt: Callable[[str], str] = getpass, public: bool = False, **kwargs) -> int:
+    # public: func only needs the public half of the keys, so encrypted OpenSSH keys are not decrypted
+    failures = 0
+    for record in iter_records(lines):
+        if record.passthrough:
+            if passthrough:
+                output.write(record.text + b'\n')
+            continue
+        try:
+            res = func(record, record.load(prompt, public=public), **kwargs)
+        except ArgumentError as error:
+            failures += 1
+            print(f'keysec: {source}:{record.line}: {error.message}', file=sys.stderr)
+            continue
+        except Exception as error:
+            failures += 1
+            print(f'keysec: {source}:{record.line}: {str(error) or type(error).__name__}', file=sys.stderr)
+            continue
+        output.write(res + b'\n')
+    return failures
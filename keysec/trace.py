@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# encoding:utf-8
+
+
+import _thread
+import atexit
+import os
+import sys
+import time
+from contextlib import nullcontext
+from typing import Optional
+
+# Opt-in timing of the stages of a keysec run, written as one JSON line per span. When tracing is off, span() hands back a shared no-op context
+# manager and nothing else runs. The stages that happen before the command line is parsed (library extraction, argparse) are buffered once
+# begin() is called, only when the command line asks for tracing. json is only imported once there is something to write.
+
+_NULL = nullcontext()
+_TEMPFILE_EVENTS = ('tempfile.mkstemp', 'tempfile.mkdtemp')
+_SUBPROCESS_EVENTS = ('subprocess.Popen', 'os.system', 'os.exec', 'os.spawn', 'os.posix_spawn')
+
+_fd: Optional[int] = None
+_pending: Optional[list] = None
+_begun = False
+_counters = {'subprocesses': 0, 'tempfiles': 0}
+_stack = _thread._local()  # same as threading.local, without importing threading
+
+
+class _Span:
+    __slots__ = ('name', 'attrs', 'parent', 'start', 'wall', 'cpu', 'counters')
+
+    def __init__(self, name: str, attrs: dict):
+        self.name, self.attrs = name, attrs
+
+    def __enter__(self):
+        spans = _stack.__dict__.setdefault('spans', [])
+        self.parent = spans[-1].name if spans else None
+        spans.append(self)
+        self.counters = dict(_counters)
+        self.start, self.wall, self.cpu = time.time(), time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        _stack.spans.pop()
+        _record(self.name, self.start, wall, cpu, parent=self.parent, error=exc[0].__name__ if exc[0] else None,
+                **{name: value - self.counters[name] for name, value in _counters.items()}, **self.attrs)
+        return False
+
+
+def _record(name: str, start: float, wall: float, cpu: Optional[float], **fields):
+    record = {'span': name, 'pid': os.getpid(), 'start': round(start, 6), 'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3) if cpu is not None else None}
+    record.update((key, value) for key, value in fields.items() if value is not None)
+    if _fd is not None:
+        _write(record)
+    elif _pending is not None:
+        _pending.append(record)
+
+
+def _write(record: dict):
+    import json
+    os.write(_fd, (json.dumps(record) + '\n').encode('utf-8'))
+
+
+def _audit(event: str, _):
+    if event in _SUBPROCESS_EVENTS:
+        _counters['subprocesses'] += 1
+    elif event in _TEMPFILE_EVENTS:
+        _counters['tempfiles'] += 1
+
+
+def _uptime_at_start() -> Optional[float]:
+    # Seconds elapsed since the process was started, from the kernel clock ticks (Linux only)
+    try:
+        with open('/proc/self/stat', mode='r') as stat:
+            start_ticks = int(stat.read().rpartition(')')[2].split()[19])
+        with open('/proc/uptime', mode='r') as uptime:
+            return float(uptime.read().split()[0]) - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _destination(value: str) -> Optional[int]:
+    if not value or value in ('0', 'off', 'no', 'false'):
+        return None
+    if not value.startswith('fd:'):
+        return sys.stderr.fileno()
+    if not value[3:].isdigit():
+        raise ValueError(f'{value!r} is not fd:N')
+    try:
+        os.fstat(int(value[3:]))
+    except OSError:
+        raise ValueError(f'file descriptor {value[3:]} is not open') from None
+    return int(value[3:])
+
+
+def _requested() -> bool:
+    # Whether the command line turns tracing on, before it is parsed
+    return any(arg == '--trace' or arg.startswith('--trace-fd') for arg in sys.argv[1:])
+
+
+def enabled() -> bool:
+    return _fd is not None
+
+
+def span(name: str, **attrs):
+    if _fd is None and _pending is None:
+        return _NULL
+    return _Span(name, attrs)
+
+
+def begin():
+    # Called first thing by the command line program, to account for interpreter startup and buffer the early stages
+    global _pending, _begun
+    if _begun or (_fd is None and not _requested()):
+        return
+    _begun, _pending = True, [] if _fd is None else None
+    elapsed = _uptime_at_start()
+    if elapsed is not None:
+        _record('startup', time.time() - elapsed, elapsed, time.process_time())
+
+
+def configure(value: Optional[str]):
+    """
+    Turns tracing on for the given destination (stderr, or fd:N), or off. The spans buffered since begin() are written or dropped. Raises
+    ValueError for malformed values and file descriptors that are not open.
+    """
+    global _fd, _pending
+    fd = _destination(value)
+    if fd is not None and _fd is None:
+        _fd = fd
+        sys.addaudithook(_audit)
+        elapsed = _uptime_at_start() or 0.0
+        atexit.register(_finish, time.time() - elapsed, time.perf_counter() - elapsed)
+    pending, _pending = _pending or [], None
+    for record in pending if _fd is not None else ():
+        _write(record)
+
+
+def _finish(start: float, perf_start: float):
+    _record('process', start, time.perf_counter() - perf_start, time.process_time(), **_counters)
+
+
+try:
+    configure(os.environ.get('KEYSEC_TRACE'))
+except ValueError as error:
+    print(f'keysec: ignoring KEYSEC_TRACE: {error}', file=sys.stderr)
@@ -18,7 +18,7 @@ name = 'keysec'
 
 version = VERSION
 
-description = 'With this program you will be able to generate OpenSSL and OpenSSH keys (RSA, Ed25519) and carry out transformations between both formats.'
+description = 'With this program you will be able to generate OpenSSL and OpenSSH keys (RSA, ECDSA, Ed25519) and carry out transformations between both formats.'
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -35,7 +35,7 @@ licencia = 'GPLv3+'
 
 zip_safe = False
 
-keywords = 'openssl ssl openssh ssh key private public rsa ed25519 elliptic curve cyrptography convert transform keys format pem pkcs'
+keywords = 'openssl ssl openssh ssh key private public rsa ecdsa ed25519 elliptic curve cyrptography convert transform keys format pem pkcs'
 
 python_requires = '>=3.9'
 